@@ -0,0 +1,17 @@
+import gzip
+from typing import Optional
+from ml_engine.model import MLEngine
+from .scenario import Scenario
+from .simulation import Simulation
+
+# Checkpoint files are Simulation.checkpoint() gzip'd. Blocks shared by every
+# node's view of the chain and by in-flight gossip are pickled once.
+
+def save(sim: Simulation, path: str):
+    with gzip.open(path, "wb", compresslevel=6) as f:
+        f.write(sim.checkpoint())
+
+def load(path: str, scenario: Optional[Scenario] = None, ml: Optional[MLEngine] = None) -> Simulation:
+    # Resume a run, or fork a what-if branch when `scenario` is given
+    with gzip.open(path, "rb") as f:
+        return Simulation.from_checkpoint(f.read(), scenario=scenario, ml=ml)
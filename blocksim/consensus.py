@@ -1,10 +1,130 @@
-class RoundRobinPoA:
+import math
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+class Consensus(ABC):
+    # Proposer selection plus bookkeeping shared by every scheme: how many
+    # blocks each node proposed, and time-to-finality, i.e. the time from
+    # proposal until a 2/3 quorum of nodes has applied the block.
     def __init__(self, node_ids, block_interval_ms=2000):
-        self.node_ids = node_ids
+        self.node_ids = list(node_ids)
         self.block_interval_ms = block_interval_ms
+        self.height = 0
+        self.blocks_by_node: Dict[str, int] = {nid: 0 for nid in self.node_ids}
+        self.finality_ms: List[float] = []
+        self._pending: Dict[int, list] = {}  # height -> [proposed_at, applied count]
+
+    @abstractmethod
+    def next_proposer(self) -> str:
+        ...
+
+    def set_weight(self, node_id: str, weight: float):
+        pass
+
+    @property
+    def quorum(self) -> int:
+        return max(1, math.ceil(2 * len(self.node_ids) / 3))
+
+    def on_proposed(self, node_id: str, height: int, now_ms: float):
+        self.blocks_by_node[node_id] = self.blocks_by_node.get(node_id, 0) + 1
+        self._pending[height] = [now_ms, 0]
+        self.height = height + 1
+
+    def on_applied(self, node_id: str, height: int, now_ms: float):
+        p = self._pending.get(height)
+        if p is None:
+            return
+        p[1] += 1
+        if p[1] >= self.quorum:
+            self.finality_ms.append(now_ms - p[0])
+            del self._pending[height]
+
+    def block_share(self) -> Dict[str, float]:
+        total = sum(self.blocks_by_node.values()) or 1
+        return {nid: n / total for nid, n in self.blocks_by_node.items()}
+
+class RoundRobinPoA(Consensus):
+    def __init__(self, node_ids, block_interval_ms=2000):
+        super().__init__(node_ids, block_interval_ms)
         self.index = 0
 
     def next_proposer(self):
         pid = self.node_ids[self.index % len(self.node_ids)]
         self.index += 1
-        return pid
\ No newline at end of file
+        return pid
+
+class AliasTable:
+    # Vose's alias method: O(n) build, O(1) sample
+    def __init__(self, weights: List[float]):
+        n = len(weights)
+        total = sum(weights)
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+        if n == 0 or total <= 0:
+            return
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample(self, rng: random.Random) -> int:
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+class WeightedPoA(Consensus):
+    # Stake/reputation-weighted proposer selection. Nodes are split into
+    # buckets of about sqrt(n), each with its own alias table, and a top-level
+    # alias table picks the bucket by total weight. Sampling is two O(1) draws;
+    # a weight change only rebuilds its bucket and the top table, O(sqrt(n)).
+    def __init__(
+        self,
+        node_ids,
+        weights: Optional[Dict[str, float]] = None,
+        block_interval_ms=2000,
+        rng: Optional[random.Random] = None,
+    ):
+        super().__init__(node_ids, block_interval_ms)
+        self.rng = rng or random.Random(0)
+        weights = weights or {}
+        self.weights: Dict[str, float] = {nid: float(weights.get(nid, 1.0)) for nid in self.node_ids}
+        size = max(1, math.isqrt(len(self.node_ids)))
+        self.buckets: List[List[str]] = [
+            self.node_ids[i:i + size] for i in range(0, len(self.node_ids), size)
+        ]
+        self.bucket_of: Dict[str, int] = {
+            nid: b for b, ids in enumerate(self.buckets) for nid in ids
+        }
+        self._tables = [self._bucket_table(b) for b in range(len(self.buckets))]
+        self._totals = [sum(self.weights[nid] for nid in ids) for ids in self.buckets]
+        self._top = AliasTable(self._totals)
+
+    def __getstate__(self):
+        # The rng is the simulation's, checkpointed and restored with it
+        return {**self.__dict__, "rng": None}
+
+    def _bucket_table(self, b: int) -> AliasTable:
+        return AliasTable([self.weights[nid] for nid in self.buckets[b]])
+
+    def set_weight(self, node_id: str, weight: float):
+        b = self.bucket_of[node_id]
+        self.weights[node_id] = float(weight)
+        self._tables[b] = self._bucket_table(b)
+        self._totals[b] = sum(self.weights[nid] for nid in self.buckets[b])
+        self._top = AliasTable(self._totals)
+
+    def next_proposer(self) -> str:
+        b = self._top.sample(self.rng)
+        return self.buckets[b][self._tables[b].sample(self.rng)]
+
+CONSENSUS = {
+    "round_robin": RoundRobinPoA,
+    "weighted": WeightedPoA,
+}
@@ -1,7 +1,23 @@
 import simpy
 import random
+from heapq import heappush
+from simpy.core import NORMAL
 
 class SimEnv:
-    def __init__(self, seed: int = 42):
-        self.env = simpy.Environment()
-        self.rng = random.Random(seed)
\ No newline at end of file
+    def __init__(self, seed: int = 42, initial_time: float = 0):
+        self.env = simpy.Environment(initial_time=initial_time)
+        self.rng = random.Random(seed)
+
+    def schedule_at(self, at: float) -> simpy.Event:
+        # A timeout firing at an absolute time. simpy only takes delays, and
+        # now + (at - now) can be off by an ulp, which would break resuming a
+        # checkpoint bit-for-bit.
+        ev = self.env.event()
+        ev._ok = True
+        ev._value = None
+        heappush(self.env._queue, (at, NORMAL, next(self.env._eid), ev))
+        return ev
+
+    def pending(self):
+        # Scheduled events as (time, event) in firing order
+        return [(t, ev) for t, _, _, ev in sorted(self.env._queue, key=lambda e: e[:3])]
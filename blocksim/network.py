@@ -1,4 +1,4 @@
-from typing import List, Callable
+from typing import Callable, Dict, List, Tuple
 from .messages import GossipMsg
 
 class Network:
@@ -6,16 +6,28 @@ class Network:
         self.env = env
         self.mean_latency_ms = mean_latency_ms
         self.subscribers: List[Callable[[GossipMsg], None]] = []
+        # In-flight deliveries: event -> (subscriber index, message)
+        self.pending: Dict[object, Tuple[int, GossipMsg]] = {}
 
     def subscribe(self, handler: Callable[[GossipMsg], None]):
         self.subscribers.append(handler)
 
     def broadcast(self, msg: GossipMsg):
-        for h in self.subscribers:
+        for i in range(len(self.subscribers)):
             # exponential delay with mean mean_latency_ms
             delay = max(1, int(self.env.rng.expovariate(1 / self.mean_latency_ms)))
-            self.env.env.process(self._deliver(h, msg, delay))
+            self._schedule(self.env.env.timeout(delay), i, msg)
 
-    def _deliver(self, handler, msg, delay_ms):
-        yield self.env.env.timeout(delay_ms)
-        handler(msg)
\ No newline at end of file
+    def deliver_at(self, at: float, index: int, msg: GossipMsg):
+        # Re-schedule a delivery restored from a checkpoint
+        self._schedule(self.env.schedule_at(at), index, msg)
+
+    def _schedule(self, ev, index: int, msg: GossipMsg):
+        # A plain event per delivery rather than a process: cheaper, and the
+        # in-flight set can be listed and re-created from a checkpoint
+        self.pending[ev] = (index, msg)
+        ev.callbacks.append(self._deliver)
+
+    def _deliver(self, ev):
+        index, msg = self.pending.pop(ev)
+        self.subscribers[index](msg)
@@ -1,19 +1,30 @@
-import time
 from collections import deque
-from typing import List
+from typing import Callable, Dict, List, Optional
 from .tx import UptimeReportTx
 from .messages import GossipMsg
 from .state import ChainState, Validator
 from ml_engine.model import MLEngine
 
 class Node:
-    def __init__(self, env, network, node_id: str, state: ChainState):
+    def __init__(
+        self,
+        env,
+        network,
+        node_id: str,
+        state: ChainState,
+        ml: Optional[MLEngine] = None,
+        on_block_applied: Optional[Callable[[str, dict], None]] = None,
+    ):
         self.env = env
         self.network = network
         self.node_id = node_id
         self.state = state
         self.mempool: deque[UptimeReportTx] = deque()
-        self.ml = MLEngine()
+        # Nodes can share one engine instead of each loading the model
+        self.ml = ml or MLEngine()
+        # The sample only varies by latency, so scores are memoised per value
+        self._scores: Dict[int, float] = {}
+        self.on_block_applied = on_block_applied
         network.subscribe(self.on_message)
 
     def on_message(self, msg: GossipMsg):
@@ -28,26 +39,21 @@ class Node:
             self.network.broadcast(GossipMsg(type="tx", payload=tx.__dict__))
 
     def _ml_accept(self, tx: UptimeReportTx) -> bool:
-        sample = {
-            "gas_used": 8_000_000,
-            "gas_limit": 30_000_000,
-            "transaction_count": 1,
-            "difficulty": 1e12,
-            "total_difficulty": 1e12,
-            "latency_ms": tx.latency_ms,
-        }
-        return self.ml.predict_quality(sample) >= 0.3
+        return self._tx_weight(tx) >= 0.3
 
     def _tx_weight(self, tx: UptimeReportTx) -> float:
-        sample = {
-            "gas_used": 8_000_000,
-            "gas_limit": 30_000_000,
-            "transaction_count": 1,
-            "difficulty": 1e12,
-            "total_difficulty": 1e12,
-            "latency_ms": tx.latency_ms,
-        }
-        return self.ml.predict_quality(sample)
+        q = self._scores.get(tx.latency_ms)
+        if q is None:
+            sample = {
+                "gas_used": 8_000_000,
+                "gas_limit": 30_000_000,
+                "transaction_count": 1,
+                "difficulty": 1e12,
+                "total_difficulty": 1e12,
+                "latency_ms": tx.latency_ms,
+            }
+            q = self._scores[tx.latency_ms] = self.ml.predict_quality(sample)
+        return q
 
     def _maybe_add_tx(self, tx_dict: dict):
         tx = UptimeReportTx(**tx_dict)
@@ -62,8 +68,10 @@ class Node:
             v.balance += tx["reward"]
             self.state.validators[vid] = v
         self.state.chain.append(block)
+        if self.on_block_applied:
+            self.on_block_applied(self.node_id, block)
 
-    def produce_block(self):
+    def produce_block(self, height: Optional[int] = None) -> dict:
         batch: List[UptimeReportTx] = list(self.mempool)
         self.mempool.clear()
         weights = {}
@@ -80,7 +88,10 @@ class Node:
 
         block = {
             "producer": self.node_id,
-            "time": int(time.time()),
+            "time": int(self.env.env.now // 1000),  # simulated seconds
             "txs": txs_out,
         }
-        self.network.broadcast(GossipMsg(type="block", payload=block))
\ No newline at end of file
+        if height is not None:
+            block["height"] = height
+        self.network.broadcast(GossipMsg(type="block", payload=block))
+        return block
\ No newline at end of file
@@ -1,52 +1,67 @@
-import time
-from .env import SimEnv
-from .network import Network
-from .state import ChainState
-from .node import Node
-from .consensus import RoundRobinPoA
-from .tx import UptimeReportTx
+import argparse
+import os
+from . import checkpoint
+from .scenario import Scenario
+from .simulation import Simulation
+
+def run(scenario: Scenario) -> dict:
+    return Simulation(scenario).run()
 
 def main():
-    env = SimEnv()
-    net = Network(env, mean_latency_ms=100)
-    state = ChainState()
-
-    nodes = []
-    for i in range(3):
-        n = Node(env, net, f"node-{i}", state)
-        nodes.append(n)
-
-    cons = RoundRobinPoA([n.node_id for n in nodes], block_interval_ms=2000)
-
-    def block_loop():
-        while True:
-            proposer_id = cons.next_proposer()
-            proposer = next(n for n in nodes if n.node_id == proposer_id)
-            proposer.produce_block()
-            yield env.env.timeout(cons.block_interval_ms)
-
-    env.env.process(block_loop())
-
-    def traffic():
-        t = 0
-        while t < 20000:
-            tx = UptimeReportTx(
-                website_id="1",
-                validator_id="0xvalidatorA",
-                status=1,
-                latency_ms=120 + (t % 80),
-                timestamp=int(time.time()),
-            )
-            nodes[0].submit_tx_local(tx)
-            yield env.env.timeout(250)
-            t += 250
-
-    env.env.process(traffic())
-    env.env.run(until=20000)
-
-    print("Blocks:", len(state.chain))
-    print("Reports:", len(state.reports))
-    print("Balances:", {vid: v.balance for vid, v in state.validators.items()})
+    parser = argparse.ArgumentParser(description="Run a blocksim scenario")
+    parser.add_argument("--scenario", help="scenario JSON file (default: 3 nodes, 1 validator, 20 s)")
+    parser.add_argument("--resume", help="checkpoint file to resume from; with --scenario, fork a what-if branch")
+    parser.add_argument("--until-ms", type=float, help="stop at this simulated time (default: scenario duration)")
+    parser.add_argument("--checkpoint-every-ms", type=float, help="write a checkpoint every N simulated ms")
+    parser.add_argument("--checkpoint-dir", default="checkpoints")
+    args = parser.parse_args()
+
+    override = Scenario.load(args.scenario) if args.scenario else None
+    if args.resume:
+        sim = checkpoint.load(args.resume, scenario=override)
+        print(f"Resumed {args.resume} at {sim.now / 1000:.1f} simulated s")
+    else:
+        sim = Simulation(override or Scenario())
+    scenario = sim.scenario
+
+    def on_checkpoint(sim: Simulation):
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+        path = os.path.join(args.checkpoint_dir, f"{scenario.name}-{int(sim.now)}.ckpt")
+        checkpoint.save(sim, path)
+        print(f"Checkpoint: {path} ({os.path.getsize(path) / 1024:.0f} KiB)")
+
+    result = sim.run(
+        until_ms=args.until_ms,
+        checkpoint_every_ms=args.checkpoint_every_ms,
+        on_checkpoint=on_checkpoint if args.checkpoint_every_ms else None,
+    )
+    state = result.pop("state")
+
+    print("Scenario:", scenario.name)
+    print("Blocks:", result["blocks"])
+    print("Reports:", result["reports"])
+    if len(state.validators) <= 20:
+        print("Balances:", {vid: v.balance for vid, v in state.validators.items()})
+    else:
+        top = sorted(state.validators.values(), key=lambda v: v.balance, reverse=True)[:5]
+        print(f"Validators paid: {len(state.validators)}, top:", {v.id: v.balance for v in top})
+    print(f"Ticks: {result['ticks_submitted']} submitted, {result['ticks_dropped']} dropped")
+    print(
+        f"Events: {result['events']} in {result['sim_s']:.0f} simulated s, "
+        f"{result['wall_s']:.2f} wall s ({result['events_per_s']:,.0f} events/s)"
+    )
+    print("State hash:", result["state_hash"])
+    print(f"Peak RSS: {result['peak_rss_mb']:.1f} MB")
+
+    share = result["block_share"]
+    shown = sorted(share.items(), key=lambda kv: kv[1], reverse=True)[:10]
+    print(f"Block share ({scenario.consensus}):", {nid: round(s, 3) for nid, s in shown})
+    fin = sorted(result["finality_ms"])
+    if fin:
+        print(
+            f"Time to finality: mean {sum(fin) / len(fin):.0f} ms, "
+            f"p50 {fin[len(fin) // 2]:.0f} ms, p99 {fin[min(len(fin) - 1, int(len(fin) * 0.99))]:.0f} ms"
+        )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,51 @@
+import json
+from dataclasses import dataclass, field, fields
+from typing import List
+
+@dataclass
+class ValidatorProfile:
+    # A population of validators sharing latency and failure behaviour.
+    # Validator ids are "<name>-<i>" (just "<name>" when count == 1).
+    name: str
+    count: int = 1
+    ticks_per_s: float = 4.0  # aggregate rate for the whole population
+    latency_mean_ms: float = 160.0
+    latency_sd_ms: float = 25.0
+    failure_rate: float = 0.0  # share of checks reporting the site down
+    drop_rate: float = 0.0  # share of checks never submitted (offline)
+
+@dataclass
+class Scenario:
+    name: str = "default"
+    seed: int = 42
+    nodes: int = 3
+    websites: int = 1
+    duration_ms: int = 20_000
+    block_interval_ms: int = 2_000
+    network_latency_ms: int = 100
+    consensus: str = "round_robin"  # or "weighted"
+    node_weights: List[float] = field(default_factory=list)  # stake per node, default equal
+    validators: List[ValidatorProfile] = field(
+        default_factory=lambda: [ValidatorProfile(name="0xvalidatorA")]
+    )
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Scenario":
+        known = {f.name for f in fields(cls)}
+        unknown = set(d) - known
+        if unknown:
+            raise ValueError(f"unknown scenario keys: {sorted(unknown)}")
+        d = dict(d)
+        d["validators"] = [ValidatorProfile(**v) for v in d.get("validators", [])] or [
+            ValidatorProfile(name="0xvalidatorA")
+        ]
+        return cls(**d)
+
+    @classmethod
+    def load(cls, path: str) -> "Scenario":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    @property
+    def validator_count(self) -> int:
+        return sum(p.count for p in self.validators)
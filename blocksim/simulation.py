@@ -0,0 +1,238 @@
+import hashlib
+import pickle
+import random
+import resource
+import time
+from typing import Callable, Dict, List, Optional
+from .env import SimEnv
+from .network import Network
+from .state import ChainState
+from .node import Node
+from .consensus import CONSENSUS, Consensus, WeightedPoA
+from .scenario import Scenario
+from .workload import TrafficStats, validator_traffic
+from ml_engine.model import MLEngine
+
+CHECKPOINT_VERSION = 1
+
+class Simulation:
+    # One blocksim run: nodes, gossip network, consensus and validator
+    # traffic on a simpy clock (ms).
+    #
+    # Every scheduled event is either a gossip delivery (Network.pending) or
+    # the next wake-up of the block loop / a traffic population (timers), so
+    # the event queue can be written out as data. checkpoint() captures it
+    # with the chain state, mempools, consensus and RNG state;
+    # from_checkpoint() re-queues the events in their original order, and
+    # the resumed run is bit-identical to one that never stopped.
+    def __init__(self, scenario: Scenario, ml: Optional[MLEngine] = None, _restore: Optional[dict] = None):
+        self.scenario = scenario
+        now = _restore["now"] if _restore else 0
+        self.env = SimEnv(seed=scenario.seed, initial_time=now)
+        self.net = Network(self.env, mean_latency_ms=scenario.network_latency_ms)
+        self.state: ChainState = _restore["state"] if _restore else ChainState()
+        self.stats: TrafficStats = _restore["stats"] if _restore else TrafficStats()
+        self.events: int = _restore["events"] if _restore else 0
+        # Wall time and events accumulate across resumes, so events_per_s
+        # covers the whole run
+        self.wall_s: float = _restore["wall_s"] if _restore else 0.0
+        self.timers: Dict[tuple, object] = {}
+
+        node_ids = [f"node-{i}" for i in range(scenario.nodes)]
+        if _restore:
+            self.cons: Consensus = _restore["consensus"]
+            if isinstance(self.cons, WeightedPoA):
+                self.cons.rng = self.env.rng
+        else:
+            self.cons = self._consensus(node_ids)
+
+        def on_block_applied(node_id: str, block: dict):
+            self.cons.on_applied(node_id, block["height"], self.env.env.now)
+
+        ml = ml or MLEngine()
+        self.nodes: Dict[str, Node] = {}
+        for nid in node_ids:
+            self.nodes[nid] = Node(self.env, self.net, nid, self.state, ml=ml, on_block_applied=on_block_applied)
+
+        if _restore is None:
+            self._start({})
+            return
+        for node, mempool in zip(self.nodes.values(), _restore["mempools"]):
+            node.mempool.extend(mempool)
+        self.env.rng.setstate(_restore["rng"])
+        # Re-queue in original order so same-time events still fire in order
+        firsts = {}
+        for at, item in _restore["pending"]:
+            if item[0] == "deliver":
+                self.net.deliver_at(at, item[1], item[2])
+            else:
+                firsts[item] = self.env.schedule_at(at)
+        self._start(firsts)
+        # Restarting the processes costs one simpy event each; the original
+        # run already counted theirs
+        self.events -= 1 + len(self.scenario.validators)
+
+    def _consensus(self, node_ids: List[str]) -> Consensus:
+        s = self.scenario
+        if s.consensus not in CONSENSUS:
+            raise ValueError(f"unknown consensus {s.consensus!r}")
+        if s.consensus == "weighted":
+            return WeightedPoA(
+                node_ids,
+                weights=dict(zip(node_ids, s.node_weights)),
+                block_interval_ms=s.block_interval_ms,
+                rng=self.env.rng,
+            )
+        return CONSENSUS[s.consensus](node_ids, block_interval_ms=s.block_interval_ms)
+
+    def _start(self, firsts: dict):
+        sim = self.env.env
+        sim.process(self._block_loop(firsts.get(("block",))))
+        for i, profile in enumerate(self.scenario.validators):
+            key = ("traffic", i)
+            sim.process(
+                validator_traffic(
+                    self.env, list(self.nodes.values()), self.scenario, profile, self.stats,
+                    timers=self.timers, key=key, first=firsts.get(key),
+                )
+            )
+
+    def _block_loop(self, first=None):
+        # Without `first` the first block is produced at start time
+        sim = self.env.env
+        ev = first
+        while True:
+            if ev is not None:
+                self.timers[("block",)] = ev
+                yield ev
+            proposer = self.nodes[self.cons.next_proposer()]
+            height = self.cons.height
+            proposer.produce_block(height)
+            self.cons.on_proposed(proposer.node_id, height, sim.now)
+            ev = sim.timeout(self.cons.block_interval_ms)
+
+    @property
+    def now(self) -> float:
+        return self.env.env.now
+
+    def run(
+        self,
+        until_ms: Optional[float] = None,
+        checkpoint_every_ms: Optional[float] = None,
+        on_checkpoint: Optional[Callable[["Simulation"], None]] = None,
+    ) -> dict:
+        # Advance to until_ms (default: the scenario duration), calling
+        # on_checkpoint every checkpoint_every_ms of simulated time
+        sim = self.env.env
+        until = self.scenario.duration_ms if until_ms is None else until_ms
+        every = checkpoint_every_ms if on_checkpoint else None
+        next_ckpt = (sim.now // every + 1) * every if every else until
+        wall0 = time.perf_counter()
+        while True:
+            stop = min(until, next_ckpt)
+            # Step by hand to count processed events
+            while sim.peek() < stop:
+                sim.step()
+                self.events += 1
+            if stop > sim.now:
+                sim.run(until=stop)
+            # Also when the run ends on a boundary: that is the checkpoint a
+            # warm-up run exists to write
+            if every and stop == next_ckpt:
+                self.wall_s += time.perf_counter() - wall0
+                on_checkpoint(self)
+                wall0 = time.perf_counter()
+                next_ckpt += every
+            if stop >= until:
+                break
+        self.wall_s += time.perf_counter() - wall0
+        return self.result()
+
+    def checkpoint(self) -> bytes:
+        # Pickled, so a fork never shares mutable state with this run
+        known = {ev: key for key, ev in self.timers.items()}
+        pending = []
+        for at, ev in self.env.pending():
+            if ev in self.net.pending:
+                index, msg = self.net.pending[ev]
+                pending.append((at, ("deliver", index, msg)))
+            elif ev in known:
+                pending.append((at, known[ev]))
+            else:
+                raise RuntimeError(f"cannot checkpoint unknown event {ev!r}")
+        data = {
+            "version": CHECKPOINT_VERSION,
+            "scenario": self.scenario,
+            "now": self.now,
+            "rng": self.env.rng.getstate(),
+            "state": self.state,
+            "mempools": [list(node.mempool) for node in self.nodes.values()],
+            "consensus": self.cons,
+            "stats": self.stats,
+            "events": self.events,
+            "wall_s": self.wall_s,
+            "pending": pending,
+        }
+        return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def from_checkpoint(
+        cls,
+        blob: bytes,
+        scenario: Optional[Scenario] = None,
+        ml: Optional[MLEngine] = None,
+    ) -> "Simulation":
+        # With `scenario`, fork a what-if branch: traffic profiles, block
+        # interval, node weights and duration may change from here on, and a
+        # different seed reseeds the RNG to sample another future. Node count
+        # and consensus scheme are fixed by the checkpoint.
+        data = pickle.loads(blob)
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"unsupported checkpoint version {data.get('version')!r}")
+        base: Scenario = data["scenario"]
+        if scenario is None:
+            return cls(base, ml=ml, _restore=data)
+        if scenario.nodes != base.nodes or scenario.consensus != base.consensus:
+            raise ValueError("a fork must keep the checkpoint's node count and consensus")
+        if scenario.seed != base.seed:
+            data["rng"] = random.Random(scenario.seed).getstate()
+        # Traffic populations are matched by position; extra ones start fresh
+        data["pending"] = [
+            (at, item) for at, item in data["pending"]
+            if item[0] != "traffic" or item[1] < len(scenario.validators)
+        ]
+        cons: Consensus = data["consensus"]
+        cons.block_interval_ms = scenario.block_interval_ms
+        if isinstance(cons, WeightedPoA) and scenario.node_weights != base.node_weights:
+            for nid, w in zip(cons.node_ids, scenario.node_weights):
+                cons.set_weight(nid, w)
+        return cls(scenario, ml=ml, _restore=data)
+
+    def result(self) -> dict:
+        return {
+            "state": self.state,
+            "blocks": len(self.state.chain),
+            "reports": len(self.state.reports),
+            "ticks_submitted": self.stats.submitted,
+            "ticks_dropped": self.stats.dropped,
+            "events": self.events,
+            "sim_s": self.now / 1000,
+            "wall_s": self.wall_s,
+            "events_per_s": self.events / self.wall_s if self.wall_s else 0.0,
+            "block_share": self.cons.block_share(),
+            "finality_ms": self.cons.finality_ms,
+            "state_hash": self.state_hash(),
+            # ru_maxrss is in KiB on Linux
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+
+    def state_hash(self) -> str:
+        # Digest of chain, reports and balances, to compare runs
+        h = hashlib.sha256()
+        for block in self.state.chain:
+            h.update(repr(block).encode())
+        for report in self.state.reports:
+            h.update(repr(report).encode())
+        for vid in sorted(self.state.validators):
+            h.update(f"{vid}={self.state.validators[vid].balance};".encode())
+        return h.hexdigest()
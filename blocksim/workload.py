@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from .scenario import Scenario, ValidatorProfile
+from .tx import UptimeReportTx
+
+# blocksim reports status=1 for a healthy check
+STATUS_UP = 1
+STATUS_DOWN = 0
+
+@dataclass
+class TrafficStats:
+    submitted: int = 0
+    dropped: int = 0
+
+def validator_traffic(
+    env,
+    nodes: List,
+    scenario: Scenario,
+    profile: ValidatorProfile,
+    stats: TrafficStats,
+    timers: Optional[Dict] = None,
+    key=None,
+    first=None,
+):
+    # One process per population, not per validator: arrivals are Poisson at
+    # the population's aggregate rate and each picks a random validator and
+    # website, so memory does not grow with validator or website counts.
+    # All times come from the simulation clock (ms).
+    #
+    # The pending arrival is kept in timers[key] so a checkpoint can record
+    # it; a resumed run passes it back as `first`.
+    rng = env.rng
+    sim = env.env
+    rate_per_ms = profile.ticks_per_s / 1000.0
+    if rate_per_ms <= 0:
+        return
+    single = profile.count == 1
+    n_nodes = len(nodes)
+    timers = {} if timers is None else timers
+    ev = first
+    while True:
+        if ev is None:
+            ev = sim.timeout(rng.expovariate(rate_per_ms))
+        timers[key] = ev
+        yield ev
+        ev = None
+        if profile.drop_rate and rng.random() < profile.drop_rate:
+            stats.dropped += 1
+            continue
+        i = rng.randrange(profile.count)
+        failed = profile.failure_rate and rng.random() < profile.failure_rate
+        tx = UptimeReportTx(
+            website_id=str(1 + rng.randrange(scenario.websites)),
+            validator_id=profile.name if single else f"{profile.name}-{i}",
+            status=STATUS_DOWN if failed else STATUS_UP,
+            latency_ms=max(1, int(rng.gauss(profile.latency_mean_ms, profile.latency_sd_ms))),
+            timestamp=int(sim.now // 1000),
+        )
+        nodes[rng.randrange(n_nodes)].submit_tx_local(tx)
+        stats.submitted += 1
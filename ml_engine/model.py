@@ -87,6 +87,37 @@ class MLEngine:
         score = 0.5 * score_pred + 0.5 * score_obs
         return float(np.clip(score, 0.05, 0.99))
 
+    def predict_quality_batch(self, samples: dict) -> np.ndarray:
+        # Column-oriented predict_quality: every key maps to a scalar or an
+        # array with one entry per tick, and the model is called once.
+        lat_obs = np.atleast_1d(np.asarray(samples.get("latency_ms", 0.0), dtype=float))
+        n = lat_obs.shape[0]
+        score_obs = 1.0 / (1.0 + lat_obs / 300.0)
+
+        if self.model is None:
+            return np.clip(score_obs, 0.05, 0.99)
+
+        def col(name, default):
+            return np.broadcast_to(np.asarray(samples.get(name, default), dtype=float), (n,))
+
+        gas_used = col("gas_used", 0)
+        tx_count = col("transaction_count", 0)
+        log_difficulty = np.log(col("difficulty", 1) + 1)
+        input_df = pd.DataFrame(
+            {
+                "gas_used": gas_used,
+                "transaction_count": tx_count,
+                "log_difficulty": log_difficulty,
+                "block_score": 0.4 * gas_used + 0.3 * tx_count + 0.3 / (1 + log_difficulty),
+            }
+        )
+
+        pred = np.asarray(self.model.predict(input_df), dtype=float)
+        score_pred = 1.0 / (1.0 + 5e6 * np.maximum(pred, 1e-12))
+
+        score = 0.5 * score_pred + 0.5 * score_obs
+        return np.clip(score, 0.05, 0.99)
+
 # import sys, joblib, pandas as pd, numpy as np
 # from pathlib import Path
 # from sklearn.base import BaseEstimator, RegressorMixin
@@ -1,12 +1,42 @@
 import threading
 import time
-from fastapi import FastAPI, Query
+from contextlib import asynccontextmanager
+import numpy as np
+import secrets
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, WebSocket
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from .state import ChainState
-from .node import Node
-from .models import TickIn, TicksBatch, CreateWebsiteIn, RegisterValidatorIn, AddBalanceIn
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from .state import EMPTY_REPORTS, EMPTY_ROLLUPS, ChainState, Rollup
+from .snapshot import Snapshot
+from .node import TICK_SAMPLE, Node, shards_from_env
+from .retention import DOWN_STATUS, UP_STATUS, RetentionPolicy
+from .models import TickIn, TicksBatch, CreateWebsiteIn, RegisterValidatorIn, AddBalanceIn, SitesReadIn
+from .stream import stream_ticks
+from .codec import TICKS_CONTENT_TYPE, decode_ticks
+from .replay import recorder_from_env
+from .inference import executor_from_env
+from .scheduler import BlockScheduler
+from .verdicts import EMPTY_VERDICTS, VerdictView
+from .pubsub import Broker
+from .profiling import MemoryTracker, collapsed, debug_token, sample_cpu
 
-app = FastAPI(title="DecenTrack Simulator")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Stop producing blocks before the recorder is closed, so the log ends
+    # with the last block
+    scheduler.stop()
+    broker.close()
+    if recorder:
+        recorder.close()
+    # Joins the batcher thread and shuts the worker processes down
+    if inference:
+        inference.close()
+
+app = FastAPI(title="DecenTrack Simulator", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -15,158 +45,439 @@ app.add_middleware(
 )
 
 state = ChainState()
-node = Node(state)
+# DECENTRACK_INFERENCE_WORKERS=<n> moves ML scoring into n worker processes
+inference = executor_from_env(TICK_SAMPLE)
+node = Node(state, retention=RetentionPolicy(), shards=shards_from_env(), inference=inference)
+# Opt-in traffic recording for sim.replay, enabled by DECENTRACK_RECORD=<path>
+recorder = recorder_from_env()
 
 @app.get("/health")
 def health():
     return {"ok": True}
 
+def produce_block():
+    now = int(time.time())
+    node.produce_block(now)
+    if recorder:
+        recorder.record("block", now)
+
+# Blocks come early under mempool pressure and back off when idle
+scheduler = BlockScheduler(node, produce=produce_block)
+
 def block_loop():
-    while True:
-        time.sleep(2.0)
-        node.produce_block()
+    scheduler.run()
 
-threading.Thread(target=block_loop, daemon=True).start()
+threading.Thread(target=block_loop, name="block_loop", daemon=True).start()
+
+@app.get("/metrics/blocks")
+def block_metrics():
+    return {
+        "status": "Success",
+        "data": {
+            **node.metrics.summary(),
+            "pending": node.pending,
+            "idleIntervalMs": scheduler.idle_interval_s * 1000,
+            "subscribers": broker.subscribers,
+        },
+    }
 
 @app.post("/tx/addTick")
 def add_tick(body: TickIn, validator: str = Query(default="0xvalidator")):
+    now = int(time.time())
+    if recorder:
+        recorder.record("tick", validator, now, [body.websiteId, body.status, body.latency])
     ok = node.submit_tick(
         {
             "website_id": body.websiteId,
             "validator": validator,
             "status": int(body.status),
             "latency": int(body.latency),
-            "timestamp": int(time.time()),
+            "timestamp": now,
         }
     )
     return {"status": "Success" if ok else "Rejected", "accepted": ok}
 
-@app.post("/tx/addMultipleTicks")
-def add_multiple_ticks(batch: TicksBatch, validator: str = Query(default="0xvalidator")):
-    accepted = 0
-    for t in batch.data:
-        ok = node.submit_tick(
+@app.post(
+    "/tx/addMultipleTicks",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": TicksBatch.model_json_schema()},
+                TICKS_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+)
+async def add_multiple_ticks(request: Request, validator: str = Query(default="0xvalidator")):
+    body = await request.body()
+    now = int(time.time())
+
+    if request.headers.get("content-type", "").startswith(TICKS_CONTENT_TYPE):
+        try:
+            website_ids, statuses, latencies = decode_ticks(body)
+        except ValueError as e:
+            return {"status": "Error", "error": str(e)}
+        if recorder:
+            rows = np.column_stack([website_ids, statuses, latencies]).tolist()
+            recorder.record("ticks", validator, now, rows)
+        accepted = await run_in_threadpool(
+            node.submit_tick_arrays, website_ids, statuses, latencies, validator, now
+        )
+        return {"status": "Success", "accepted": accepted, "total": len(latencies)}
+
+    try:
+        batch = TicksBatch.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    if recorder:
+        rows = [[t.websiteId, t.status, t.latency] for t in batch.data]
+        recorder.record("ticks", validator, now, rows)
+    results = await node.submit_ticks_async(
+        [
             {
                 "website_id": t.websiteId,
                 "validator": validator,
                 "status": int(t.status),
                 "latency": int(t.latency),
-                "timestamp": int(time.time()),
+                "timestamp": now,
             }
-        )
-        accepted += int(ok)
-    return {"status": "Success", "accepted": accepted, "total": len(batch.data)}
+            for t in batch.data
+        ],
+    )
+    return {"status": "Success", "accepted": sum(results), "total": len(batch.data)}
+
+@app.websocket("/tx/ticksStream")
+async def ticks_stream(ws: WebSocket):
+    await stream_ticks(ws, node, recorder)
 
 @app.post("/website/create")
 def create_website(body: CreateWebsiteIn, owner: str = Query(default="0xowner")):
+    if recorder:
+        recorder.record("website", body.url, body.contactInfo, owner)
     wid = node.add_website(body.url, body.contactInfo, owner)
     return {"status": "Success", "websiteId": wid}
 
 @app.delete("/website/{website_id}")
 def delete_website(website_id: str):
+    if recorder:
+        recorder.record("delete", website_id)
     ok = node.delete_website(website_id)
     return {"status": "Success" if ok else "NotFound"}
 
+# Read endpoints take node.snapshot once and answer from it alone, so they
+# never lock against block production and always reflect a single height.
+
 @app.get("/websites")
 def get_all_websites():
-    return {"websites": [vars(w) for w in state.websites.values()]}
+    snap = node.snapshot
+    return {"websites": [vars(w) for w in snap.websites.values()], "height": snap.height}
 
 @app.get("/website/{website_id}")
 def get_website(website_id: str):
-    w = state.websites.get(website_id)
+    snap = node.snapshot
+    w = snap.websites.get(website_id)
     if not w:
         return {"status": "Error", "error": "Not found"}
-    return {"status": "Success", "data": vars(w)}
+    return {"status": "Success", "data": vars(w), "height": snap.height}
 
 @app.post("/validator/register")
 def register_validator(body: RegisterValidatorIn, address: str = Query(default="0xvalidator")):
+    if recorder:
+        recorder.record("validator", address, body.publicKey, body.location)
     v = node.register_validator(address, body.publicKey, body.location)
-    return {"status": "Success", "data": vars(v)}
+    out = {"status": "Success", "data": vars(v)}
+    # Returned once; required to open /tx/ticksStream as this validator
+    token = node.issue_stream_token(address)
+    if token:
+        out["streamToken"] = token
+    return out
 
 @app.get("/validator/{address}")
 def get_validator(address: str):
-    v = state.validators.get(address)
-    return {"status": "Success", "data": vars(v) if v else None}
+    snap = node.snapshot
+    v = snap.validators.get(address)
+    return {"status": "Success", "data": vars(v) if v else None, "height": snap.height}
 
 @app.get("/validator/{address}/authenticated")
 def is_validator_authenticated(address: str):
-    v = state.validators.get(address)
+    v = node.snapshot.validators.get(address)
     return bool(v and v.authenticated)
 
-# sim/api.py (only showing the two ticks endpoints)
+def _report_out(r: dict) -> dict:
+    return {
+        "validator": r["validator"],
+        "createdAt": r["createdAt"],
+        "status": r["status"],
+        "latency": r["latency"],
+        "location": r.get("location", "sim-location"),
+        "ml_weight": r.get("ml_weight", 1.0),
+    }
+
+def _rollup_out(roll: Rollup, snap: Snapshot) -> dict:
+    # Same shape as a raw tick, plus the aggregate fields
+    v = snap.validators.get(roll.validator)
+    return {
+        "validator": roll.validator,
+        "createdAt": roll.start,
+        "status": UP_STATUS if 2 * roll.up >= roll.count else DOWN_STATUS,
+        "latency": round(roll.latency_sum / roll.count),
+        "location": v.location if v else "sim-location",
+        "ml_weight": roll.weight_sum / roll.count,
+        "resolution": roll.resolution,
+        "count": roll.count,
+        "uptime": roll.up / roll.count,
+        "latencyMin": roll.latency_min,
+        "latencyMax": roll.latency_max,
+    }
+
+def _recent_ticks(snap: Snapshot, website_id: str, n: int) -> list:
+    # Newest raw ticks first; older history comes from rollups when the raw
+    # window holds fewer than n ticks.
+    raw = snap.ticks.get(website_id, EMPTY_REPORTS).last(n)
+    out = [_report_out(r) for r in reversed(raw)]
+    if len(out) < n:
+        for roll in reversed(snap.rollups.get(website_id, EMPTY_ROLLUPS)):
+            if len(out) >= n:
+                break
+            out.append(_rollup_out(roll, snap))
+    out.reverse()
+    return out
+
 @app.get("/ticks/{website_id}")
 def get_recent_ticks(website_id: str, n: int = 10):
-    ticks = [r for r in state.reports if r["website_id"] == website_id][-n:]
+    snap = node.snapshot
+    return {"status": "Success", "data": _recent_ticks(snap, website_id, n), "height": snap.height}
+
+@app.get("/ticks/{website_id}/all")
+def get_all_ticks(website_id: str):
+    snap = node.snapshot
+    rolled = [_rollup_out(roll, snap) for roll in snap.rollups.get(website_id, EMPTY_ROLLUPS)]
+    raw = [_report_out(r) for r in snap.ticks.get(website_id, EMPTY_REPORTS)]
+    return {"status": "Success", "data": rolled + raw, "height": snap.height}
+
+def _verdicts_out(view: VerdictView, n: int) -> list:
+    return [
+        {
+            "height": height,
+            "time": t,
+            "status": status,
+            "latency": latency,
+            "ticks": ticks,
+            "weight": round(weight, 4),
+            "agreement": round(agreement, 4),
+            "dissenters": view.dissenters[dissent:dissent + dissents],
+        }
+        for height, t, status, latency, ticks, weight, agreement, dissent, dissents in view.last(n).tolist()
+    ]
+
+@app.get("/verdicts/{website_id}")
+def get_verdicts(website_id: str, n: int = Query(default=100, ge=1, le=10_000)):
+    # One ML-weighted consensus record per block the site had ticks in,
+    # oldest first: status majority, median latency and dissenters
+    snap = node.snapshot
+    view = snap.verdicts.get(website_id, EMPTY_VERDICTS)
+    return {"status": "Success", "data": _verdicts_out(view, n), "height": snap.height}
+
+def _tick_stats(ticks: list) -> dict:
+    # Over the returned ticks; a rollup counts as its number of checks
+    count = up = 0
+    latency = 0.0
+    for t in ticks:
+        c = t.get("count", 1)
+        count += c
+        up += t["uptime"] * c if "uptime" in t else t["status"] == UP_STATUS
+        latency += t["latency"] * c
+    return {
+        "count": count,
+        "uptime": up / count if count else None,
+        "avgLatency": latency / count if count else None,
+    }
+
+@app.post("/sites/read")
+def read_sites(body: SitesReadIn):
+    # Dashboard batch read: recent ticks, balance, stats and latest verdict
+    # for many websites, all from one snapshot
+    snap = node.snapshot
+    data = {}
+    for wid in dict.fromkeys(body.websiteIds):
+        w = snap.websites.get(wid)
+        ticks = _recent_ticks(snap, wid, body.n)
+        verdict = _verdicts_out(snap.verdicts.get(wid, EMPTY_VERDICTS), 1)
+        data[wid] = {
+            "found": w is not None,
+            "balance": str(w.balance_wei) if w else None,
+            "ticks": ticks,
+            "stats": _tick_stats(ticks),
+            "verdict": verdict[0] if verdict else None,
+        }
+    return {"status": "Success", "data": data, "height": snap.height}
+
+def _block_out(b: dict) -> dict:
+    return {
+        "height": b["height"],
+        "hash": b["hash"],
+        "prevHash": b["prev_hash"],
+        "time": b["time"],
+        "txs": b["txs"],
+        "weights": b["weights"],
+        "reportRange": [b["report_start"], b["report_end"]],
+    }
+
+# Pushes each block's ticks and header to SSE subscribers
+broker = Broker(report_out=_report_out, block_out=_block_out)
+node.on_block = broker.publish
+
+@app.get("/subscribe")
+def subscribe(
+    websites: str = Query(default="", description="comma-separated website ids"),
+    blocks: bool = False,
+):
+    # Server-sent events: "ticks" per subscribed website with new ticks in a
+    # block, "block" for every block when blocks=true, and "missed" when a
+    # slow client's buffer overflowed
+    ids = [w for w in websites.split(",") if w]
+    if len(ids) > 1000:
+        raise HTTPException(status_code=422, detail="at most 1000 websites per subscription")
+    if not ids and not blocks:
+        raise HTTPException(status_code=422, detail="subscribe to websites or blocks")
+    return StreamingResponse(
+        broker.subscribe(ids, blocks),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/blocks/latest")
+def get_latest_blocks(n: int = Query(default=10, ge=1, le=1000)):
+    snap = node.snapshot
     return {
         "status": "Success",
-        "data": [
-            {
-                "validator": r["validator"],
-                "createdAt": r["createdAt"],
-                "status": r["status"],
-                "latency": r["latency"],
-                "location": r.get("location", "sim-location"),
-                "ml_weight": r.get("ml_weight", 1.0),
-            }
-            for r in ticks
-        ],
+        "data": [_block_out(b) for b in snap.chain.latest(n)],
+        "height": snap.height,
     }
 
-@app.get("/ticks/{website_id}/all")
-def get_all_ticks(website_id: str):
-    ticks = [r for r in state.reports if r["website_id"] == website_id]
+@app.get("/blocks")
+def get_blocks_in_range(
+    start: int = 0,
+    end: int = Query(default=2**62),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=1000),
+):
+    snap = node.snapshot
+    blocks, total = snap.chain.time_range(start, end, offset, limit)
     return {
         "status": "Success",
-        "data": [
-            {
-                "validator": r["validator"],
-                "createdAt": r["createdAt"],
-                "status": r["status"],
-                "latency": r["latency"],
-                "location": r.get("location", "sim-location"),
-                "ml_weight": r.get("ml_weight", 1.0),
-            }
-            for r in ticks
-        ],
+        "data": [_block_out(b) for b in blocks],
+        "total": total,
+        "next": offset + limit if offset + limit < total else None,
+        "height": snap.height,
+    }
+
+@app.get("/blocks/{height}")
+def get_block(height: int):
+    b = node.snapshot.chain.get(height)
+    if not b:
+        return {"status": "Error", "error": "Not found"}
+    return {"status": "Success", "data": _block_out(b)}
+
+@app.get("/blocks/{height}/reports")
+def get_block_reports(height: int):
+    # Reports already compacted into rollups are no longer listed
+    snap = node.snapshot
+    b = snap.chain.get(height)
+    if not b:
+        return {"status": "Error", "error": "Not found"}
+    reports = snap.reports.slice(b["report_start"], b["report_end"])
+    return {
+        "status": "Success",
+        "data": [{**_report_out(r), "websiteId": r["website_id"]} for r in reports],
     }
 
 @app.get("/me/websites")
 def get_my_websites(owner: str):
-    items = [vars(w) for w in state.websites.values() if w.owner == owner]
-    return {"status": "Success", "data": items}
+    snap = node.snapshot
+    items = [vars(w) for w in snap.websites.values() if w.owner == owner]
+    return {"status": "Success", "data": items, "height": snap.height}
 
 @app.get("/me/pendingPayout")
 def my_pending_payout(owner: str):
-    v = state.validators.get(owner)
+    snap = node.snapshot
+    v = snap.validators.get(owner)
     bal = v.balance if v else 0
-    return {"status": "Success", "data": str(bal)}
+    return {"status": "Success", "data": str(bal), "height": snap.height}
 
 @app.post("/me/payouts")
 def get_my_payouts(owner: str = Query(default="0xowner")):
-    v = state.validators.get(owner)
-    if v:
-        amount = v.balance
-        v.balance = 0
-        rec = {"time": int(time.time()), "amount": amount}
-        state.payouts.setdefault(owner, []).append(rec)
+    now = int(time.time())
+    if recorder:
+        recorder.record("payout", owner, now)
+    rec = node.payout(owner, now)
+    if rec:
         return {"status": "Success", "txHash": f"sim-{rec['time']}"}
     return {"status": "Error", "error": "Not found"}
 
 @app.post("/website/{website_id}/balance")
 def add_website_balance(website_id: str, body: AddBalanceIn):
-    w = state.websites.get(website_id)
-    if not w:
+    if recorder:
+        recorder.record("balance", website_id, body.amount)
+    if not node.add_website_balance(website_id, body.amount):
         return {"status": "Error", "error": "Not found"}
-    try:
-        wei = int(float(body.amount) * 1e18)
-    except Exception:
-        wei = 0
-    w.balance_wei += wei
     return {"status": "Success", "txHash": f"sim-{int(time.time())}"}
 
 @app.get("/website/{website_id}/balance")
 def get_website_balance(website_id: str):
-    w = state.websites.get(website_id)
+    snap = node.snapshot
+    w = snap.websites.get(website_id)
     if not w:
         return {"status": "Error", "error": "Not found"}
-    return {"status": "Success", "data": str(w.balance_wei)}
\ No newline at end of file
+    return {"status": "Success", "data": str(w.balance_wei), "height": snap.height}
+
+# Debug endpoints: disabled (404) unless DECENTRACK_DEBUG_TOKEN is set
+memory_tracker = MemoryTracker(
+    {
+        "reports": lambda: state.reports,
+        "rollups": lambda: state.rollups,
+        "chain": lambda: node.chain,
+        "mempool": lambda: [shard.mempool for shard in node.shards],
+        "verdicts": lambda: [shard.verdicts for shard in node.shards],
+        "payouts": lambda: state.payouts,
+    }
+)
+cpu_profile_lock = threading.Lock()
+
+def require_debug_token(x_debug_token: str = Header(default="")):
+    token = debug_token()
+    if token is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(x_debug_token.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@app.get("/debug/profile/cpu", dependencies=[Depends(require_debug_token)])
+async def profile_cpu(
+    seconds: float = Query(default=10.0, gt=0, le=120),
+    hz: int = Query(default=100, ge=1, le=1000),
+    idle: bool = False,
+):
+    # Collapsed wall-clock stacks of every busy thread (idle=true keeps
+    # threads parked in waits), for flamegraph.pl or speedscope
+    if not cpu_profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Profile already running")
+    try:
+        stacks = await run_in_threadpool(sample_cpu, seconds, hz, idle)
+    finally:
+        cpu_profile_lock.release()
+    return PlainTextResponse(collapsed(stacks))
+
+@app.post("/debug/memory/start", dependencies=[Depends(require_debug_token)])
+def memory_start(nframes: int = Query(default=10, ge=1, le=100)):
+    memory_tracker.start(nframes)
+    return {"status": "Success"}
+
+@app.get("/debug/memory/snapshot", dependencies=[Depends(require_debug_token)])
+def memory_snapshot(top: int = Query(default=20, ge=1, le=500)):
+    return {"status": "Success", "data": memory_tracker.snapshot(top)}
+
+@app.post("/debug/memory/stop", dependencies=[Depends(require_debug_token)])
+def memory_stop():
+    memory_tracker.stop()
+    return {"status": "Success"}
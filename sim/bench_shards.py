@@ -0,0 +1,78 @@
+# sim/bench_shards.py
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from .inference import InferenceExecutor
+from .node import TICK_SAMPLE, Node
+from .state import ChainState
+
+def run(
+    shards: int,
+    workers: int,
+    ticks: int,
+    websites: int,
+    ml_enabled: bool,
+    inference: Optional[InferenceExecutor] = None,
+) -> float:
+    # Ticks/s for `workers` threads calling submit_tick concurrently, each on
+    # its own slice of websites, while blocks are produced in between.
+    node = Node(
+        ChainState(),
+        ml_enabled=ml_enabled or inference is not None,
+        shards=shards,
+        inference=inference,
+    )
+    per_worker = ticks // workers
+
+    def worker(w: int):
+        for i in range(per_worker):
+            node.submit_tick(
+                {
+                    "website_id": str(1 + (w * websites // workers) + i % max(websites // workers, 1)),
+                    "validator": f"val-{w}",
+                    "status": 0,
+                    "latency": 100 + i % 400,
+                    "timestamp": i,
+                }
+            )
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(worker, w) for w in range(workers)]
+        while not all(f.done() for f in futures):
+            node.produce_block()
+            time.sleep(0.01)
+        for f in futures:
+            f.result()
+    node.produce_block()
+    return per_worker * workers / (time.perf_counter() - t0)
+
+def main():
+    parser = argparse.ArgumentParser(description="submit_tick throughput vs threadpool size")
+    parser.add_argument("--ticks", type=int, default=200_000)
+    parser.add_argument("--websites", type=int, default=1024)
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--ml", action="store_true", help="score ticks with the ML model")
+    parser.add_argument(
+        "--inference",
+        type=int,
+        default=0,
+        help="score ticks in this many worker processes; request threads wait off the GIL",
+    )
+    args = parser.parse_args()
+
+    inference = InferenceExecutor(TICK_SAMPLE, workers=args.inference) if args.inference else None
+    try:
+        print(f"{'workers':>7} {'1 shard':>12} {f'{args.shards} shards':>12}   ticks/s")
+        for workers in (int(w) for w in args.workers.split(",")):
+            single = run(1, workers, args.ticks, args.websites, args.ml, inference)
+            sharded = run(args.shards, workers, args.ticks, args.websites, args.ml, inference)
+            print(f"{workers:>7} {single:>12,.0f} {sharded:>12,.0f}")
+    finally:
+        if inference:
+            inference.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# sim/blocks.py
+import hashlib
+import json
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional
+
+GENESIS_HASH = "0x" + "00" * 32
+
+class ChainView:
+    # Block history indexed by height (offset from the oldest retained block)
+    # and by time (bisect over a parallel list of block times). A view only
+    # reads the first `count` entries, so it stays valid while the chain
+    # appends past it.
+    def __init__(self, blocks: List[dict], times: List[int], base_height: int, count: int):
+        self.blocks = blocks
+        self.times = times
+        self.base_height = base_height
+        self.count = count
+
+    @property
+    def height(self) -> int:
+        # Height of the newest block, -1 before the first one
+        return self.base_height + self.count - 1
+
+    def get(self, height: int) -> Optional[dict]:
+        i = height - self.base_height
+        if 0 <= i < self.count:
+            return self.blocks[i]
+        return None
+
+    def latest(self, n: int) -> List[dict]:
+        return self.blocks[max(self.count - n, 0):self.count][::-1] if n > 0 else []
+
+    def time_range(self, start: int, end: int, offset: int = 0, limit: int = 50):
+        # Blocks with start <= time < end, oldest first; also returns the total
+        lo = bisect_left(self.times, start, 0, self.count)
+        hi = bisect_left(self.times, end, 0, self.count)
+        first = lo + max(offset, 0)
+        return self.blocks[first:min(first + max(limit, 0), hi)], max(hi - lo, 0)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[dict]:
+        for i in range(self.count):
+            yield self.blocks[i]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.blocks[:self.count][i]
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("block index out of range")
+        return self.blocks[i]
+
+class Chain(ChainView):
+    def __init__(self):
+        super().__init__([], [], 0, 0)
+        self.head_hash = GENESIS_HASH
+
+    def add(
+        self,
+        time: int,
+        txs: int,
+        weights: Dict[str, float],
+        report_start: int,
+        report_end: int,
+    ) -> dict:
+        # Keep the time index sorted even if the wall clock steps back
+        if self.times and time < self.times[-1]:
+            time = self.times[-1]
+        block = {
+            "height": self.height + 1,
+            "prev_hash": self.head_hash,
+            "time": time,
+            "txs": txs,
+            "weights": weights,
+            "report_start": report_start,
+            "report_end": report_end,
+        }
+        payload = json.dumps(block, sort_keys=True, separators=(",", ":"))
+        block["hash"] = "0x" + hashlib.sha256(payload.encode()).hexdigest()
+        self.blocks.append(block)
+        self.times.append(time)
+        self.count += 1
+        self.head_hash = block["hash"]
+        return block
+
+    def prune_before(self, cutoff: int, budget: int) -> int:
+        k = min(bisect_left(self.times, cutoff), budget)
+        if k:
+            # New lists rather than del: published views keep the old ones
+            self.blocks = self.blocks[k:]
+            self.times = self.times[k:]
+            self.base_height += k
+            self.count -= k
+        return k
+
+    def view(self) -> ChainView:
+        return ChainView(self.blocks, self.times, self.base_height, self.count)
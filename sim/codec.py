@@ -0,0 +1,29 @@
+# sim/codec.py
+import numpy as np
+
+# Binary alternative to the JSON TicksBatch body of /tx/addMultipleTicks
+TICKS_CONTENT_TYPE = "application/x-decentrack-ticks"
+
+# One packed little-endian record per tick (9 bytes):
+#   u32 website id | u8 status | u32 latency in ms
+TICK_DTYPE = np.dtype([("website_id", "<u4"), ("status", "u1"), ("latency", "<u4")])
+
+def encode_ticks(website_ids, statuses, latencies) -> bytes:
+    out = np.empty(len(website_ids), dtype=TICK_DTYPE)
+    out["website_id"] = website_ids
+    out["status"] = statuses
+    out["latency"] = latencies
+    return out.tobytes()
+
+def decode_ticks(body: bytes):
+    if len(body) % TICK_DTYPE.itemsize:
+        raise ValueError(
+            f"body length {len(body)} is not a multiple of {TICK_DTYPE.itemsize} bytes"
+        )
+    # Zero-copy view over the request body, widened to plain int64 columns
+    records = np.frombuffer(body, dtype=TICK_DTYPE)
+    return (
+        records["website_id"].astype(np.int64),
+        records["status"].astype(np.int64),
+        records["latency"].astype(np.int64),
+    )
@@ -0,0 +1,125 @@
+# sim/inference.py
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional, Sequence
+from ml_engine.model import MLEngine
+
+# Number of inference worker processes for the API server; unset or 0 keeps
+# scoring inline in the request thread.
+INFERENCE_WORKERS_ENV = "DECENTRACK_INFERENCE_WORKERS"
+
+_engine: Optional[MLEngine] = None
+_sample: dict = {}
+
+def _init_worker(sample: dict):
+    # Runs once per worker process: load the model before the first request
+    global _engine, _sample
+    _engine = MLEngine()
+    _sample = sample
+
+def _score(latencies: List[int]) -> List[float]:
+    return _engine.predict_quality_batch({**_sample, "latency_ms": latencies}).tolist()
+
+class InferenceExecutor:
+    # Scores tick latencies in a pool of worker processes, each holding its
+    # own MLEngine, so heavy models don't compete for the GIL with request
+    # handlers or block production.
+    #
+    # Concurrent requests are coalesced: a batcher thread takes everything
+    # queued within max_wait_ms (up to max_batch ticks) and sends it to the
+    # pool as one prediction, without waiting for earlier batches to finish.
+    def __init__(
+        self,
+        sample: dict,
+        workers: int = 2,
+        max_batch: int = 4096,
+        max_wait_ms: float = 2.0,
+    ):
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000.0
+        # spawn, not fork: the server process already runs threads
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(sample,),
+        )
+        self._requests: queue.Queue = queue.Queue()
+        self._closed = False
+        self._batcher = threading.Thread(target=self._run, name="inference_batcher", daemon=True)
+        self._batcher.start()
+
+    def submit(self, latencies: Sequence[int]) -> Future:
+        fut: Future = Future()
+        if self._closed:
+            fut.set_exception(RuntimeError("inference executor is closed"))
+            return fut
+        self._requests.put((list(latencies), fut))
+        return fut
+
+    def score(self, latencies: Sequence[int]) -> List[float]:
+        return self.submit(latencies).result()
+
+    async def score_async(self, latencies: Sequence[int]) -> List[float]:
+        return await asyncio.wrap_future(self.submit(latencies))
+
+    def close(self):
+        self._closed = True
+        self._requests.put(None)
+        self._batcher.join()
+        self._pool.shutdown()
+
+    def _run(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            pending = [item]
+            size = len(item[0])
+            deadline = time.perf_counter() + self.max_wait_s
+            while size < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._requests.put(None)
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self._dispatch(pending)
+
+    def _dispatch(self, pending: list):
+        merged = [lat for latencies, _ in pending for lat in latencies]
+        try:
+            batch = self._pool.submit(_score, merged)
+        except Exception as e:
+            for _, fut in pending:
+                fut.set_exception(e)
+            return
+
+        def done(batch: Future):
+            try:
+                scores = batch.result()
+            except Exception as e:
+                for _, fut in pending:
+                    fut.set_exception(e)
+                return
+            i = 0
+            for latencies, fut in pending:
+                fut.set_result(scores[i:i + len(latencies)])
+                i += len(latencies)
+
+        batch.add_done_callback(done)
+
+def executor_from_env(sample: dict) -> Optional[InferenceExecutor]:
+    workers = int(os.environ.get(INFERENCE_WORKERS_ENV) or 0)
+    return InferenceExecutor(sample, workers=workers) if workers > 0 else None
@@ -0,0 +1,55 @@
+# sim/metrics.py
+import threading
+import time
+from collections import deque
+import numpy as np
+
+class BlockMetrics:
+    # Rolling window of tick-to-inclusion latency (time from admission to the
+    # block that included the tick) and of block intervals and sizes.
+    def __init__(self, window: int = 10_000):
+        self.inclusion_s: deque = deque(maxlen=window)
+        self.intervals_s: deque = deque(maxlen=1_000)
+        self.sizes: deque = deque(maxlen=1_000)
+        self.blocks = 0
+        self._last_block = None
+        self._lock = threading.Lock()
+
+    def record_block(self, received_at: list, now: float = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.inclusion_s.extend(now - t for t in received_at)
+            if self._last_block is not None:
+                self.intervals_s.append(now - self._last_block)
+            self._last_block = now
+            self.sizes.append(len(received_at))
+            self.blocks += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            inclusion = np.fromiter(self.inclusion_s, dtype=float)
+            intervals = np.fromiter(self.intervals_s, dtype=float)
+            sizes = np.fromiter(self.sizes, dtype=float)
+            blocks = self.blocks
+
+        def pct(a, q):
+            return float(np.percentile(a, q) * 1000) if a.size else None
+
+        return {
+            "blocks": blocks,
+            "inclusionMs": {
+                "p50": pct(inclusion, 50),
+                "p90": pct(inclusion, 90),
+                "p99": pct(inclusion, 99),
+                "max": float(inclusion.max() * 1000) if inclusion.size else None,
+                "samples": int(inclusion.size),
+            },
+            "blockIntervalMs": {
+                "mean": float(intervals.mean() * 1000) if intervals.size else None,
+                "p50": pct(intervals, 50),
+            },
+            "blockSize": {
+                "mean": float(sizes.mean()) if sizes.size else None,
+                "max": int(sizes.max()) if sizes.size else None,
+            },
+        }
@@ -1,10 +1,14 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List
 
+# Latencies travel as uint32 in the binary tick codec; JSON ticks get the
+# same range
+MAX_LATENCY_MS = 2**32 - 1
+
 class TickIn(BaseModel):
     websiteId: str
     status: int
-    latency: int
+    latency: int = Field(ge=0, le=MAX_LATENCY_MS)
 
 class TicksBatch(BaseModel):
     data: List[TickIn]
@@ -18,4 +22,8 @@ class RegisterValidatorIn(BaseModel):
     location: str
 
 class AddBalanceIn(BaseModel):
-    amount: str
\ No newline at end of file
+    amount: str
+
+class SitesReadIn(BaseModel):
+    websiteIds: List[str] = Field(max_length=1000)
+    n: int = Field(default=10, ge=1, le=1000)
@@ -1,10 +1,60 @@
 # sim/node.py
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import threading
 import time
+import zlib
 from collections import deque
-from typing import List
-from .state import ChainState, Validator, Website
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from .blocks import Chain
+from .state import EMPTY_ROLLUPS, ChainState, ReportLog, Validator, Website
+from .retention import Compactor, RetentionPolicy, updated_rollups
+from .snapshot import Snapshot
+from .verdicts import VerdictTimeline
+from .metrics import BlockMetrics
+from .inference import InferenceExecutor
 from ml_engine.model import MLEngine
 
+# Fixed block-level features fed to the ML model alongside each tick's latency
+TICK_SAMPLE = {
+    "gas_used": 8_000_000,
+    "gas_limit": 30_000_000,
+    "transaction_count": 1,
+    "difficulty": 1e12,
+    "total_difficulty": 1e12,
+}
+
+# Mempool shards for the API server. One by default: admission holds the GIL,
+# so extra shards only pay off when request threads wait on out-of-process
+# scoring (DECENTRACK_INFERENCE_WORKERS); see sim.bench_shards.
+SHARDS_ENV = "DECENTRACK_SHARDS"
+
+def shards_from_env() -> int:
+    return max(int(os.environ.get(SHARDS_ENV) or 1), 1)
+
+class Shard:
+    # Pending ticks, retained reports and block verdicts for the websites
+    # hashed to this shard. The lock guards the mempool, so ticks for
+    # different shards never contend. Report partitions and verdict timelines
+    # are only written by the block producer and are read through snapshots.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mempool: deque[dict] = deque()
+        self.first_at: Optional[float] = None  # monotonic arrival of the oldest pending tick
+        self.reports: Dict[str, ReportLog] = {}
+        self.verdicts: Dict[str, VerdictTimeline] = {}
+
+    def take_batch(self) -> deque:
+        with self.lock:
+            batch, self.mempool = self.mempool, deque()
+            self.first_at = None
+        return batch
+
 class Node:
     def __init__(
         self,
@@ -13,71 +63,330 @@ class Node:
         ml_enabled: bool = True,
         weight_rewards: bool = True,
         ml_threshold: float = 0.3,
+        retention: Optional[RetentionPolicy] = None,
+        shards: int = 1,
+        inference: Optional[InferenceExecutor] = None,
     ):
         self.state = state
         self.block_time_s = block_time_s
-        self.mempool: deque[dict] = deque()
-        self.chain: List[dict] = []
+        self.shards = [Shard() for _ in range(max(shards, 1))]
+        self.chain = Chain()
         self.ml_enabled = ml_enabled
         self.weight_rewards = weight_rewards
         self.ml_threshold = ml_threshold
-        self.ml = MLEngine() if ml_enabled else None
+        # Optional out-of-process scoring; admission rules stay the same. The
+        # model is only loaded in-process when nothing else scores ticks.
+        self.inference = inference if ml_enabled else None
+        self.ml = MLEngine() if ml_enabled and not self.inference else None
+        # Without a policy, reports and chain history are kept forever
+        self.compactor = (
+            Compactor(state, retention, on_drop=self._forget_reports) if retention else None
+        )
+        # Serialises writers (block production and direct state changes);
+        # readers use the published snapshot instead.
+        self._write_lock = threading.Lock()
+        self.snapshot = Snapshot()
+        self._dirty_websites: set = set()
+        self._dirty_validators: set = set()
+        self._dirty_sites: set = set()
+        self.metrics = BlockMetrics()
+        # Called as on_pending(pending, shard_was_empty) after ticks are queued;
+        # the block scheduler uses it to wake up early.
+        self.on_pending: Optional[Callable[[int, bool], None]] = None
+        # Called as on_block(block, snapshot) after each block is published,
+        # outside the write lock; must not block (e.g. hand off to a queue).
+        self.on_block: Optional[Callable[[dict, Snapshot], None]] = None
+        # sha256 of each validator's tick stream token. Kept out of state and
+        # snapshots so no read endpoint can serve it.
+        self._stream_tokens: Dict[str, bytes] = {}
+
+    def shard_for(self, website_id: str) -> Shard:
+        return self.shards[self._shard_index(website_id)]
+
+    def _shard_index(self, website_id: str) -> int:
+        # crc32 rather than hash() so placement (and block order) is the same
+        # in every process, which replays rely on
+        if len(self.shards) == 1:
+            return 0
+        return zlib.crc32(website_id.encode("utf-8", "surrogatepass")) % len(self.shards)
+
+    @property
+    def pending(self) -> int:
+        return sum(len(s.mempool) for s in self.shards)
+
+    def oldest_pending_at(self) -> Optional[float]:
+        times = [s.first_at for s in self.shards if s.first_at is not None]
+        return min(times) if times else None
 
     def submit_tick(self, tick: dict) -> bool:
-        sample = {
-            "gas_used": 8_000_000,
-            "gas_limit": 30_000_000,
-            "transaction_count": 1,
-            "difficulty": 1e12,
-            "total_difficulty": 1e12,
-            "latency_ms": tick["latency"],
-        }
-
-        if self.ml_enabled and self.ml:
-            q = self.ml.predict_quality(sample)
-            tick["ml_weight"] = q
-            if q < self.ml_threshold:
-                return False
+        if self.inference:
+            q = self.inference.score([tick["latency"]])[0]
+        elif self.ml:
+            q = self.ml.predict_quality({**TICK_SAMPLE, "latency_ms": tick["latency"]})
         else:
-            tick["ml_weight"] = 1.0
-
-        self.mempool.append(tick)
+            q = 1.0
+        if not self._accept(tick, q):
+            return False
+        self._enqueue([tick])
         return True
 
-    def add_website(self, url: str, contact_info: str, owner: str) -> str:
-        wid = str(len(self.state.websites) + 1)
-        self.state.websites[wid] = Website(
-            id=wid, url=url, contact_info=contact_info, owner=owner
+    def submit_ticks(self, ticks: List[dict]) -> List[bool]:
+        # Same admission as submit_tick, but the whole batch is scored with a
+        # single model call instead of one DataFrame per tick.
+        if not ticks:
+            return []
+        scores = self._score_latencies([t["latency"] for t in ticks]).tolist()
+        return self._admit_scored(ticks, scores)
+
+    async def submit_ticks_async(self, ticks: List[dict]) -> List[bool]:
+        # For event-loop callers: awaits the inference pool directly, or runs
+        # inline scoring in a worker thread.
+        if not self.inference:
+            return await asyncio.to_thread(self.submit_ticks, ticks)
+        if not ticks:
+            return []
+        scores = await self.inference.score_async([t["latency"] for t in ticks])
+        return self._admit_scored(ticks, scores)
+
+    def _admit_scored(self, ticks: List[dict], scores: List[float]) -> List[bool]:
+        results = [self._accept(t, q) for t, q in zip(ticks, scores)]
+        self._enqueue([t for t, ok in zip(ticks, results) if ok])
+        return results
+
+    def submit_tick_arrays(
+        self,
+        website_ids: np.ndarray,
+        statuses: np.ndarray,
+        latencies: np.ndarray,
+        validator: str,
+        timestamp: int,
+    ) -> int:
+        # Column-oriented admission for decoded binary batches: scoring and the
+        # threshold run on whole arrays, and only accepted ticks become dicts.
+        if len(latencies) == 0:
+            return 0
+        scores = self._score_latencies(latencies)
+        keep = np.ones(len(scores), dtype=bool)
+        if self.ml_enabled:
+            keep = scores >= self.ml_threshold
+        self._enqueue(
+            [
+                {
+                    "website_id": str(wid),
+                    "validator": validator,
+                    "status": status,
+                    "latency": latency,
+                    "timestamp": timestamp,
+                    "ml_weight": q,
+                }
+                for wid, status, latency, q in zip(
+                    website_ids[keep].tolist(),
+                    statuses[keep].tolist(),
+                    latencies[keep].tolist(),
+                    scores[keep].tolist(),
+                )
+            ]
         )
+        return int(keep.sum())
+
+    def _score_latencies(self, latencies) -> np.ndarray:
+        if self.inference:
+            return np.asarray(self.inference.score(np.asarray(latencies).tolist()))
+        if self.ml:
+            return self.ml.predict_quality_batch({**TICK_SAMPLE, "latency_ms": latencies})
+        return np.ones(len(latencies))
+
+    def _accept(self, tick: dict, q: float) -> bool:
+        tick["ml_weight"] = q
+        return not (self.ml_enabled and q < self.ml_threshold)
+
+    def _enqueue(self, ticks: List[dict]):
+        # One lock acquisition per shard touched by the batch
+        if not ticks:
+            return
+        now = time.monotonic()
+        for t in ticks:
+            t["received_at"] = now
+        if len(self.shards) == 1 or len(ticks) == 1:
+            groups = {self._shard_index(ticks[0]["website_id"]): ticks}
+        else:
+            groups: Dict[int, List[dict]] = {}
+            for t in ticks:
+                groups.setdefault(self._shard_index(t["website_id"]), []).append(t)
+        was_empty = False
+        for i, group in groups.items():
+            shard = self.shards[i]
+            with shard.lock:
+                if not shard.mempool:
+                    shard.first_at = now
+                    was_empty = True
+                shard.mempool.extend(group)
+        # Summing every shard is only worth it for a listener
+        on_pending = self.on_pending
+        if on_pending is not None:
+            on_pending(self.pending, was_empty)
+
+    def _forget_reports(self, reports: List[dict]):
+        # Called by the compactor: dropped reports are always the oldest of
+        # their website, so they sit at the front of its partition.
+        for r in reports:
+            wid = r["website_id"]
+            self.shard_for(wid).reports[wid].drop_oldest()
+            self._dirty_sites.add(wid)
+
+    def add_website(self, url: str, contact_info: str, owner: str) -> str:
+        with self._write_lock:
+            wid = str(len(self.state.websites) + 1)
+            self.state.websites[wid] = Website(
+                id=wid, url=url, contact_info=contact_info, owner=owner
+            )
+            self._dirty_websites.add(wid)
+            self._publish()
         return wid
 
     def delete_website(self, website_id: str) -> bool:
-        return self.state.websites.pop(website_id, None) is not None
+        with self._write_lock:
+            ok = self.state.websites.pop(website_id, None) is not None
+            self._dirty_websites.add(website_id)
+            self._publish()
+        return ok
 
     def register_validator(self, address: str, public_key: str, location: str):
-        v = self.state.validators.get(address) or Validator(address=address)
-        v.public_key = public_key
-        v.location = location
-        v.authenticated = True
-        self.state.validators[address] = v
+        with self._write_lock:
+            v = self.state.validators.get(address) or Validator(address=address)
+            v.public_key = public_key
+            v.location = location
+            v.authenticated = True
+            self.state.validators[address] = v
+            self._dirty_validators.add(address)
+            self._publish()
         return v
 
-    def produce_block(self):
-        batch = list(self.mempool)
-        self.mempool.clear()
+    def issue_stream_token(self, address: str) -> Optional[str]:
+        # Issued once, on first registration; later calls return None so
+        # re-registering an address cannot take over its stream
+        with self._write_lock:
+            if address in self._stream_tokens:
+                return None
+            token = secrets.token_urlsafe(32)
+            self._stream_tokens[address] = hashlib.sha256(token.encode()).digest()
+        return token
+
+    def check_stream_token(self, address: str, token: str) -> bool:
+        expected = self._stream_tokens.get(address)
+        if expected is None:
+            return False
+        # surrogatepass: a JSON hello can carry lone surrogates
+        digest = hashlib.sha256(token.encode("utf-8", "surrogatepass")).digest()
+        return hmac.compare_digest(expected, digest)
+
+    def add_website_balance(self, website_id: str, amount: str) -> bool:
+        with self._write_lock:
+            w = self.state.websites.get(website_id)
+            if not w:
+                return False
+            try:
+                wei = int(float(amount) * 1e18)
+            except Exception:
+                wei = 0
+            w.balance_wei += wei
+            self._dirty_websites.add(website_id)
+            self._publish()
+        return True
+
+    def payout(self, owner: str, now: Optional[int] = None) -> Optional[dict]:
+        with self._write_lock:
+            v = self.state.validators.get(owner)
+            if not v:
+                return None
+            amount = v.balance
+            v.balance = 0
+            rec = {"time": int(time.time()) if now is None else now, "amount": amount}
+            self.state.payouts.setdefault(owner, []).append(rec)
+            self._dirty_validators.add(owner)
+            self._publish()
+        return rec
+
+    def _publish(self):
+        # Build the next snapshot from the previous one, copying only the
+        # entries that changed since, and within each map only the parts
+        # holding them. Called with the write lock held.
+        prev = self.snapshot
+
+        websites, gone = {}, []
+        for wid in self._dirty_websites:
+            w = self.state.websites.get(wid)
+            if w:
+                websites[wid] = replace(w)
+            else:
+                gone.append(wid)
+        validators = {vid: replace(self.state.validators[vid]) for vid in self._dirty_validators}
+        ticks, verdicts = {}, {}
+        for wid in self._dirty_sites:
+            shard = self.shard_for(wid)
+            ticks[wid] = shard.reports[wid].view()
+            if wid in shard.verdicts:
+                verdicts[wid] = shard.verdicts[wid].view()
+        rollups, unrolled = {}, []
+        touched = self.compactor.touched if self.compactor else {}
+        for wid, keys in touched.items():
+            view = updated_rollups(self.state, prev.rollups.get(wid, EMPTY_ROLLUPS), wid, keys)
+            if view.hours or view.minutes:
+                rollups[wid] = view
+            else:
+                unrolled.append(wid)
+        touched.clear()
+
+        self._dirty_websites.clear()
+        self._dirty_validators.clear()
+        self._dirty_sites.clear()
+        # A single reference swap; readers see either snapshot, never a mix
+        self.snapshot = Snapshot(
+            version=prev.version + 1,
+            height=self.chain.height,
+            websites=prev.websites.updated(websites, gone),
+            validators=prev.validators.updated(validators),
+            ticks=prev.ticks.updated(ticks),
+            rollups=prev.rollups.updated(rollups, unrolled),
+            verdicts=prev.verdicts.updated(verdicts),
+            reports=self.state.reports.view(),
+            chain=self.chain.view(),
+        )
+
+    def produce_block(self, now: Optional[int] = None):
+        with self._write_lock:
+            block = self._produce_block(now)
+            self._publish()
+            snap = self.snapshot
+        if self.on_block:
+            self.on_block(block, snap)
+
+    def _produce_block(self, now: Optional[int]) -> dict:
+        # Each shard hands over its pending ticks; rewards are computed over
+        # the merged batch.
+        batches = [(shard, shard.take_batch()) for shard in self.shards]
+        report_start = self.state.reports.next_seq
 
         reward_pool = 100
         weights = {}
-        for tx in batch:
-            vid = tx["validator"]
-            w = tx.get("ml_weight", 1.0) if self.weight_rewards else 1.0
-            weights[vid] = weights.get(vid, 0.0) + w
+        txs = 0
+        received = []
+        by_site: List[tuple] = []  # (shard, website id, reports) for verdicts
+        for shard, batch in batches:
+            if not batch:
+                continue
+            txs += len(batch)
+            produced = []
+            for tx in batch:
+                received.append(tx["received_at"])
+                vid = tx["validator"]
+                w = tx.get("ml_weight", 1.0) if self.weight_rewards else 1.0
+                weights[vid] = weights.get(vid, 0.0) + w
 
-            v = self.state.validators.get(tx["validator"])
-            loc = v.location if v else "sim-location"
+                v = self.state.validators.get(tx["validator"])
+                loc = v.location if v else "sim-location"
 
-            self.state.reports.append(
-                {
+                report = {
                     "validator": tx["validator"],
                     "createdAt": tx.get("timestamp", int(time.time())),
                     "status": tx["status"],
@@ -86,7 +395,18 @@ class Node:
                     "ml_weight": tx.get("ml_weight", 1.0),
                     "website_id": tx["website_id"],
                 }
-            )
+                self.state.reports.append(report)
+                produced.append(report)
+            grouped: Dict[str, List[dict]] = {}
+            for report in produced:
+                wid = report["website_id"]
+                site = shard.reports.get(wid)
+                if site is None:
+                    site = shard.reports[wid] = ReportLog()
+                site.append(report)
+                grouped.setdefault(wid, []).append(report)
+                self._dirty_sites.add(wid)
+            by_site.extend((shard, wid, reports) for wid, reports in grouped.items())
 
         total_w = sum(weights.values()) or 1.0
         for vid, w in weights.items():
@@ -94,8 +414,28 @@ class Node:
             v = self.state.validators.get(vid) or Validator(address=vid)
             v.balance += share
             self.state.validators[vid] = v
+            self._dirty_validators.add(vid)
+
+        if now is None:
+            now = int(time.time())
+        block = self.chain.add(now, txs, weights, report_start, self.state.reports.next_seq)
+        self._record_verdicts(block, by_site)
+        self.metrics.record_block(received)
+        if self.compactor:
+            self.compactor.step(now, self.chain)
+        return block
 
-        self.chain.append({"time": int(time.time()), "txs": len(batch), "weights": weights})
+    def _record_verdicts(self, block: dict, by_site: List[tuple]):
+        # One ML-weighted verdict per website with ticks in the block. Old
+        # verdicts are pruned as a site's timeline grows.
+        window = self.compactor.policy.verdict_window_s if self.compactor else None
+        for shard, wid, reports in by_site:
+            timeline = shard.verdicts.get(wid)
+            if timeline is None:
+                timeline = shard.verdicts[wid] = VerdictTimeline()
+            timeline.append(block["height"], block["time"], reports)
+            if window is not None:
+                timeline.prune_before(block["time"] - window)
 
     def run_tick(self):
         self.produce_block()
@@ -0,0 +1,147 @@
+# sim/profiling.py
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import BuiltinFunctionType, FunctionType, ModuleType
+from typing import Dict, Optional
+
+# Debug endpoints are disabled unless this is set; callers must send it back
+# in the X-Debug-Token header.
+DEBUG_TOKEN_ENV = "DECENTRACK_DEBUG_TOKEN"
+
+def debug_token() -> Optional[str]:
+    return os.environ.get(DEBUG_TOKEN_ENV) or None
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    label = f"{code.co_name} ({os.path.basename(code.co_filename)})"
+    return label.replace(";", ":")
+
+# Innermost Python frames of a thread parked on a lock, queue or selector.
+# A thread blocked in C shows its caller as the leaf.
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),  # concurrent.futures worker in SimpleQueue.get
+}
+
+def _idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES
+
+def sample_cpu(seconds: float, hz: int = 100, idle: bool = False) -> Counter:
+    # Samples every other thread's stack hz times per second and counts
+    # collapsed stacks ("thread;outer;...;inner"), the input format of
+    # flamegraph.pl and speedscope. Nothing runs outside this call.
+    #
+    # Stacks are sampled whatever the thread is doing, so this is a
+    # wall-clock profile. Unless idle is set, threads waiting in a known
+    # blocking call are left out; otherwise idle worker pools dominate.
+    me = threading.get_ident()
+    interval = 1.0 / hz
+    names = {}
+    stacks: Counter = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for tid, frame in sys._current_frames().items():
+            if tid == me or (not idle and _idle(frame)):
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if tid not in names:
+                names = {t.ident: t.name for t in threading.enumerate()}
+            labels.append(names.get(tid, str(tid)).replace(";", ":"))
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+    return stacks
+
+def collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+_SKIP = (type, ModuleType, FunctionType, BuiltinFunctionType)
+
+def deep_size(root) -> int:
+    # Bytes reachable from root (shared objects counted once), stopping at
+    # classes, modules and functions.
+    seen = set()
+    todo = [root]
+    total = 0
+    while todo:
+        obj = todo.pop()
+        if id(obj) in seen or isinstance(obj, _SKIP):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        todo.extend(gc.get_referents(obj))
+    return total
+
+class MemoryTracker:
+    # tracemalloc is only running between start() and stop(), so there is
+    # no allocation overhead unless someone is investigating.
+    def __init__(self, structures: Dict[str, callable]):
+        self.structures = structures
+        self._snapshot = None
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, nframes: int = 10):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(nframes)
+            self._snapshot = tracemalloc.take_snapshot()
+            self._sizes = self._measure()
+
+    def stop(self):
+        with self._lock:
+            tracemalloc.stop()
+            self._snapshot = None
+            self._sizes = {}
+
+    def _measure(self) -> Dict[str, int]:
+        return {name: deep_size(get()) for name, get in self.structures.items()}
+
+    def snapshot(self, top: int = 20) -> dict:
+        # Diff against the previous snapshot: per-structure retained bytes
+        # plus the allocation sites that grew the most.
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                return {"running": False}
+            snap = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)]
+            )
+            sizes = self._measure()
+            stats = snap.compare_to(self._snapshot, "lineno") if self._snapshot else []
+            prev = self._sizes
+            self._snapshot, self._sizes = snap, sizes
+
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "running": True,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "structures": {
+                name: {"bytes": size, "delta_bytes": size - prev.get(name, size)}
+                for name, size in sizes.items()
+            },
+            "top_growth": [
+                {
+                    "site": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                    "size_diff": s.size_diff,
+                    "count_diff": s.count_diff,
+                    "size": s.size,
+                }
+                for s in stats[:top]
+            ],
+        }
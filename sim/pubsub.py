@@ -0,0 +1,155 @@
+# sim/pubsub.py
+import asyncio
+import json
+import queue
+import threading
+import traceback
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
+from .snapshot import Snapshot
+
+CLIENT_BUFFER = 256  # events held per subscriber before the oldest are dropped
+KEEPALIVE_S = 15.0
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+class Subscription:
+    # One client's filter and bounded outbox. Only touched on the event loop.
+    def __init__(self, websites: Iterable[str], blocks: bool, buffer: int):
+        self.websites = frozenset(websites)
+        self.blocks = blocks
+        self.outbox: deque = deque(maxlen=buffer)
+        self.missed = 0  # events dropped since the client last caught up
+        self.ready = asyncio.Event()
+
+    def push(self, events: List[str]):
+        for e in events:
+            if len(self.outbox) == self.outbox.maxlen:
+                self.missed += 1
+            self.outbox.append(e)
+        self.ready.set()
+
+class Broker:
+    # Pushes per-block deltas to SSE subscribers. Node calls publish() with
+    # each new block; that only queues it. A fan-out thread slices the
+    # block's reports from the snapshot, encodes each website's delta once,
+    # and hands every subscriber its events with one call into the event
+    # loop per block. A slow client loses its oldest events, never the
+    # producer's time, and is told how many it missed.
+    def __init__(
+        self,
+        report_out: Callable[[dict], dict],
+        block_out: Callable[[dict], dict],
+        buffer: int = CLIENT_BUFFER,
+    ):
+        self.report_out = report_out
+        self.block_out = block_out
+        self.buffer = buffer
+        self._lock = threading.Lock()  # guards the subscription index
+        self._by_site: Dict[str, set] = {}
+        self._block_subs: set = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inbox: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="pubsub_fanout", daemon=True)
+        self._thread.start()
+
+    def publish(self, block: dict, snap: Snapshot):
+        self._inbox.put((block, snap))
+
+    def close(self):
+        self._inbox.put(None)
+        self._thread.join()
+
+    @property
+    def subscribers(self) -> int:
+        with self._lock:
+            subs = set(self._block_subs)
+            for s in self._by_site.values():
+                subs |= s
+            return len(subs)
+
+    async def subscribe(self, websites: Iterable[str], blocks: bool) -> AsyncIterator[str]:
+        # SSE stream for one client; unsubscribes when the client goes away
+        self._loop = asyncio.get_running_loop()
+        sub = Subscription(websites, blocks, self.buffer)
+        with self._lock:
+            for wid in sub.websites:
+                self._by_site.setdefault(wid, set()).add(sub)
+            if blocks:
+                self._block_subs.add(sub)
+        try:
+            yield sse("subscribed", {"websites": sorted(sub.websites), "blocks": blocks})
+            while True:
+                try:
+                    await asyncio.wait_for(sub.ready.wait(), KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                sub.ready.clear()
+                if sub.missed:
+                    yield sse("missed", {"events": sub.missed})
+                    sub.missed = 0
+                while sub.outbox:
+                    yield sub.outbox.popleft()
+        finally:
+            with self._lock:
+                for wid in sub.websites:
+                    subs = self._by_site.get(wid)
+                    if subs is not None:
+                        subs.discard(sub)
+                        if not subs:
+                            del self._by_site[wid]
+                self._block_subs.discard(sub)
+
+    def _run(self):
+        while True:
+            item = self._inbox.get()
+            if item is None:
+                return
+            try:
+                self._fan_out(*item)
+            except Exception:
+                # Keep the thread alive for later blocks
+                traceback.print_exc()
+
+    def _fan_out(self, block: dict, snap: Snapshot):
+        with self._lock:
+            by_site = {wid: list(subs) for wid, subs in self._by_site.items()}
+            block_subs = list(self._block_subs)
+        loop = self._loop
+        if loop is None or not (by_site or block_subs):
+            return
+
+        out: Dict[Subscription, List[str]] = {}
+        if block_subs:
+            event = sse("block", self.block_out(block))
+            for sub in block_subs:
+                out.setdefault(sub, []).append(event)
+        if by_site:
+            grouped: Dict[str, List[dict]] = {}
+            for r in snap.reports.slice(block["report_start"], block["report_end"]):
+                wid = r["website_id"]
+                if wid in by_site:
+                    grouped.setdefault(wid, []).append(r)
+            for wid, reports in grouped.items():
+                event = sse(
+                    "ticks",
+                    {
+                        "websiteId": wid,
+                        "height": block["height"],
+                        "data": [self.report_out(r) for r in reports],
+                    },
+                )
+                for sub in by_site[wid]:
+                    out.setdefault(sub, []).append(event)
+        if out:
+            try:
+                loop.call_soon_threadsafe(self._deliver, out)
+            except RuntimeError:
+                pass  # event loop closed
+
+    @staticmethod
+    def _deliver(out: Dict[Subscription, List[str]]):
+        for sub, events in out.items():
+            sub.push(events)
@@ -0,0 +1,176 @@
+# sim/replay.py
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import threading
+import time
+from typing import Iterator, Optional
+import numpy as np
+from .node import SHARDS_ENV, Node, shards_from_env
+from .retention import RetentionPolicy
+from .state import ChainState
+
+# Set to a file path to make the API server record its mutating calls
+RECORD_ENV = "DECENTRACK_RECORD"
+
+# Log format: one compact JSON array per line, [op, wall_time, *args].
+# Ticks are [website_id, status, latency] rows so batches stay small.
+#   ["tick",      t, validator, timestamp, [wid, status, latency]]
+#   ["ticks",     t, validator, timestamp, [[wid, status, latency], ...]]
+#   ["website",   t, url, contact_info, owner]
+#   ["delete",    t, website_id]
+#   ["validator", t, address, public_key, location]
+#   ["balance",   t, website_id, amount]
+#   ["payout",    t, owner, timestamp]
+#   ["block",     t, timestamp]
+
+class Recorder:
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "a", buffering=1 << 16)
+        self._lock = threading.Lock()
+
+    def record(self, op: str, *args):
+        line = json.dumps([op, round(time.time(), 3), *args], separators=(",", ":"))
+        with self._lock:
+            if self._f.closed:
+                return
+            self._f.write(line + "\n")
+            # Buffered between blocks; a crash loses at most one block's calls
+            if op == "block":
+                self._f.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._f.closed:
+                self._f.flush()
+
+    def close(self):
+        with self._lock:
+            self._f.close()
+
+def recorder_from_env() -> Optional[Recorder]:
+    path = os.environ.get(RECORD_ENV)
+    return Recorder(path) if path else None
+
+def read_log(path: str) -> Iterator[list]:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def _tick(validator: str, timestamp: int, row: list) -> dict:
+    wid, status, latency = row
+    return {
+        "website_id": str(wid),
+        "validator": validator,
+        "status": int(status),
+        "latency": int(latency),
+        "timestamp": timestamp,
+    }
+
+def apply(node: Node, rec: list):
+    op, args = rec[0], rec[2:]
+    if op == "tick":
+        validator, ts, row = args
+        node.submit_tick(_tick(validator, ts, row))
+    elif op == "ticks":
+        validator, ts, rows = args
+        node.submit_ticks([_tick(validator, ts, r) for r in rows])
+    elif op == "website":
+        node.add_website(*args)
+    elif op == "delete":
+        node.delete_website(*args)
+    elif op == "validator":
+        node.register_validator(*args)
+    elif op == "balance":
+        node.add_website_balance(*args)
+    elif op == "payout":
+        node.payout(*args)
+    elif op == "block":
+        node.produce_block(*args)
+    else:
+        raise ValueError(f"unknown op {op!r}")
+
+def state_hash(state: ChainState, node: Node) -> str:
+    h = hashlib.sha256()
+    for addr in sorted(state.validators):
+        h.update(repr(vars(state.validators[addr])).encode())
+    for wid in sorted(state.websites):
+        h.update(repr(vars(state.websites[wid])).encode())
+    for owner in sorted(state.payouts):
+        h.update(repr((owner, state.payouts[owner])).encode())
+    for r in state.reports:
+        h.update(repr(sorted(r.items())).encode())
+    for res in sorted(state.rollups):
+        for wid in sorted(state.rollups[res]):
+            for key in sorted(state.rollups[res][wid]):
+                h.update(repr(state.rollups[res][wid][key]).encode())
+    h.update(node.chain.head_hash.encode())
+    return h.hexdigest()
+
+def replay(path: str, speed: Optional[float] = None, **node_kwargs) -> dict:
+    # speed=None replays as fast as possible, otherwise at speed x recorded pace
+    # Same retention and shard layout as sim.api, so state hashes line up
+    node_kwargs.setdefault("retention", RetentionPolicy())
+    node_kwargs.setdefault("shards", shards_from_env())
+    state = ChainState()
+    node = Node(state, **node_kwargs)
+
+    events = ticks = 0
+    block_ms = []
+    first_t = None
+    wall0 = time.perf_counter()
+    for rec in read_log(path):
+        if speed:
+            if first_t is None:
+                first_t = rec[1]
+            delay = (rec[1] - first_t) / speed - (time.perf_counter() - wall0)
+            if delay > 0:
+                time.sleep(delay)
+        if rec[0] == "block":
+            t0 = time.perf_counter()
+            apply(node, rec)
+            block_ms.append((time.perf_counter() - t0) * 1000)
+        else:
+            apply(node, rec)
+            ticks += 1 if rec[0] == "tick" else len(rec[4]) if rec[0] == "ticks" else 0
+        events += 1
+    wall = time.perf_counter() - wall0
+
+    return {
+        "events": events,
+        "ticks": ticks,
+        "blocks": len(block_ms),
+        "wall_s": wall,
+        "events_per_s": events / wall if wall else 0.0,
+        "ticks_per_s": ticks / wall if wall else 0.0,
+        "block_ms_mean": statistics.fmean(block_ms) if block_ms else 0.0,
+        "block_ms_p50": float(np.percentile(block_ms, 50)) if block_ms else 0.0,
+        "block_ms_p99": float(np.percentile(block_ms, 99)) if block_ms else 0.0,
+        "block_ms_max": max(block_ms, default=0.0),
+        "state_hash": state_hash(state, node),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded API log against Node")
+    parser.add_argument("log")
+    parser.add_argument(
+        "--speed",
+        default="max",
+        help="'max' for as fast as possible, or a multiplier of the recorded pace (1, 10, ...)",
+    )
+    parser.add_argument("--no-ml", action="store_true", help="disable ML gating")
+    parser.add_argument("--shards", type=int, default=None, help=f"default: ${SHARDS_ENV}, else 1")
+    args = parser.parse_args()
+
+    speed = None if args.speed == "max" else float(args.speed)
+    shards = args.shards if args.shards is not None else shards_from_env()
+    result = replay(args.log, speed=speed, ml_enabled=not args.no_ml, shards=shards)
+    for k, v in result.items():
+        print(f"{k}: {v:.3f}" if isinstance(v, float) else f"{k}: {v}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# sim/retention.py
+from bisect import bisect_left
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional, Set
+from .blocks import Chain
+from .state import ChainState, Rollup, RollupView
+
+# Tick status that counts towards uptime; rollups report either value
+UP_STATUS = 0
+DOWN_STATUS = 1
+
+MINUTE = 60
+HOUR = 3600
+
+@dataclass
+class RetentionPolicy:
+    raw_window_s: int = HOUR  # raw ticks younger than this are kept as-is
+    minute_window_s: int = 24 * HOUR  # 1-minute rollups, then 1-hour ones
+    chain_window_s: Optional[int] = HOUR  # None keeps every block
+    verdict_window_s: Optional[int] = 24 * HOUR  # per-website block verdicts
+    max_items_per_step: int = 5_000  # bounds the work done per block
+
+class Compactor:
+    # Incrementally folds expired raw reports into 1m rollups and expired 1m
+    # rollups into 1h rollups. step() is called once per block and never
+    # processes more than max_items_per_step entries.
+    def __init__(
+        self,
+        state: ChainState,
+        policy: RetentionPolicy,
+        on_drop: Optional[Callable[[List[dict]], None]] = None,
+    ):
+        self.state = state
+        self.policy = policy
+        # Told which raw reports were compacted, e.g. to trim report indexes
+        self.on_drop = on_drop
+        # Changed buckets, website id -> {(resolution, start, validator)};
+        # the owner clears it once consumed
+        self.touched: Dict[str, Set[tuple]] = {}
+        for res in (MINUTE, HOUR):
+            state.rollups.setdefault(res, {})
+        # 1m buckets in creation order, waiting to be promoted to 1h
+        self._minute_queue: deque = deque()
+
+    def step(self, now: int, chain: Optional[Chain] = None) -> int:
+        budget = self.policy.max_items_per_step
+        budget -= self._compact_raw(now - self.policy.raw_window_s, now, budget)
+        budget -= self._promote_minutes(now - self.policy.minute_window_s, budget)
+        if chain is not None and self.policy.chain_window_s is not None:
+            budget -= self._prune_chain(chain, now - self.policy.chain_window_s, budget)
+        return self.policy.max_items_per_step - budget
+
+    def _compact_raw(self, cutoff: int, now: int, budget: int) -> int:
+        reports = self.state.reports
+        minute_cutoff = now - self.policy.minute_window_s
+        dropped = []
+        while len(dropped) < budget:
+            r = reports.oldest()
+            if r is None or r["createdAt"] >= cutoff:
+                break
+            res = MINUTE if r["createdAt"] >= minute_cutoff else HOUR
+            self._fold_tick(r, res)
+            reports.drop_oldest()
+            dropped.append(r)
+        if dropped and self.on_drop:
+            self.on_drop(dropped)
+        return len(dropped)
+
+    def _fold_tick(self, r: dict, res: int):
+        start = r["createdAt"] - r["createdAt"] % res
+        self.touched.setdefault(r["website_id"], set()).add((res, start, r["validator"]))
+        by_site = self.state.rollups[res].setdefault(r["website_id"], {})
+        key = (start, r["validator"])
+        roll = by_site.get(key)
+        lat = r["latency"]
+        if roll is None:
+            roll = Rollup(
+                website_id=r["website_id"],
+                validator=r["validator"],
+                start=start,
+                resolution=res,
+                latency_min=lat,
+                latency_max=lat,
+            )
+            by_site[key] = roll
+            if res == MINUTE:
+                self._minute_queue.append((start, r["website_id"], r["validator"]))
+        roll.count += 1
+        roll.up += int(r["status"] == UP_STATUS)
+        roll.latency_sum += lat
+        roll.latency_min = min(roll.latency_min, lat)
+        roll.latency_max = max(roll.latency_max, lat)
+        roll.weight_sum += r.get("ml_weight", 1.0)
+
+    def _promote_minutes(self, cutoff: int, budget: int) -> int:
+        minutes = self.state.rollups[MINUTE]
+        hours = self.state.rollups[HOUR]
+        done = 0
+        while done < budget and self._minute_queue and self._minute_queue[0][0] < cutoff:
+            start, wid, vid = self._minute_queue.popleft()
+            done += 1
+            site = minutes.get(wid)
+            m = site.pop((start, vid), None) if site else None
+            if m is None:
+                continue
+            if not site:
+                del minutes[wid]
+            h_start = start - start % HOUR
+            self.touched.setdefault(wid, set()).update(((MINUTE, start, vid), (HOUR, h_start, vid)))
+            h_site = hours.setdefault(wid, {})
+            h = h_site.get((h_start, vid))
+            if h is None:
+                h_site[(h_start, vid)] = Rollup(
+                    website_id=wid,
+                    validator=vid,
+                    start=h_start,
+                    resolution=HOUR,
+                    count=m.count,
+                    up=m.up,
+                    latency_sum=m.latency_sum,
+                    latency_min=m.latency_min,
+                    latency_max=m.latency_max,
+                    weight_sum=m.weight_sum,
+                )
+                continue
+            h.count += m.count
+            h.up += m.up
+            h.latency_sum += m.latency_sum
+            h.latency_min = min(h.latency_min, m.latency_min)
+            h.latency_max = max(h.latency_max, m.latency_max)
+            h.weight_sum += m.weight_sum
+        return done
+
+    def _prune_chain(self, chain: Chain, cutoff: int, budget: int) -> int:
+        return chain.prune_before(cutoff, budget)
+
+def updated_rollups(state: ChainState, view: RollupView, website_id: str, keys: Set[tuple]) -> RollupView:
+    # `view` with the changed buckets (resolution, start, validator) re-read
+    # from state. Only their groups are rebuilt; the rest are shared, so the
+    # cost follows the change, not the site's history.
+    changed: Dict[tuple, Set[str]] = {}
+    for res, start, vid in keys:
+        changed.setdefault((res, start), set()).add(vid)
+    levels = {HOUR: list(view.hours), MINUTE: list(view.minutes)}
+    for (res, start), vids in changed.items():
+        groups = levels[res]
+        site = state.rollups.get(res, {}).get(website_id, {})
+        i = bisect_left(groups, start, key=lambda g: g[0])
+        found = i < len(groups) and groups[i][0] == start
+        current = {r.validator: r for r in groups[i][1]} if found else {}
+        for vid in vids:
+            roll = site.get((start, vid))
+            if roll is None:
+                current.pop(vid, None)
+            else:
+                current[vid] = replace(roll)
+        group = tuple(current[v] for v in sorted(current))
+        if found and group:
+            groups[i] = (start, group)
+        elif found:
+            del groups[i]
+        elif group:
+            groups.insert(i, (start, group))
+    return RollupView(tuple(levels[HOUR]), tuple(levels[MINUTE]))
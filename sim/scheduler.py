@@ -0,0 +1,70 @@
+# sim/scheduler.py
+import threading
+import time
+from typing import Callable, Optional
+from .node import Node
+
+class BlockScheduler:
+    # Decides when the next block is produced instead of a fixed sleep:
+    #   - as soon as min_interval_s allows once max_pending ticks are waiting,
+    #   - when the oldest pending tick has waited max_age_s (Node.block_time_s
+    #     by default), so inclusion latency stays bounded under light load,
+    #   - with nothing pending, an empty block after an idle interval that
+    #     starts at max_age_s and doubles up to max_interval_s.
+    # Node wakes the scheduler when ticks arrive, so no polling is needed.
+    def __init__(
+        self,
+        node: Node,
+        produce: Optional[Callable[[], None]] = None,
+        min_interval_s: float = 0.25,
+        max_interval_s: float = 30.0,
+        max_pending: int = 5_000,
+        max_age_s: Optional[float] = None,
+    ):
+        self.node = node
+        self.produce = produce or node.produce_block
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.max_pending = max_pending
+        self.max_age_s = node.block_time_s if max_age_s is None else max_age_s
+        self.idle_interval_s = self.max_age_s
+        self.last_block = time.monotonic()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        node.on_pending = self._on_pending
+
+    def _on_pending(self, pending: int, was_empty: bool):
+        if was_empty or pending >= self.max_pending:
+            self._wake.set()
+
+    def next_due(self, now: float) -> float:
+        pending = self.node.pending
+        if not pending:
+            return self.last_block + self.idle_interval_s
+        if pending >= self.max_pending:
+            return self.last_block + self.min_interval_s
+        oldest = self.node.oldest_pending_at()
+        if oldest is None:
+            return self.last_block + self.idle_interval_s
+        due = min(oldest + self.max_age_s, self.last_block + self.max_interval_s)
+        return max(due, self.last_block + self.min_interval_s)
+
+    def run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            wait = self.next_due(now) - now
+            if wait > 0:
+                self._wake.wait(wait)
+                self._wake.clear()
+                continue
+            had_ticks = self.node.pending > 0
+            self.produce()
+            self.last_block = time.monotonic()
+            if had_ticks:
+                self.idle_interval_s = self.max_age_s
+            else:
+                self.idle_interval_s = min(self.idle_interval_s * 2, self.max_interval_s)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
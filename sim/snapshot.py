@@ -0,0 +1,93 @@
+# sim/snapshot.py
+import zlib
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, Optional
+from .blocks import ChainView
+from .state import EMPTY_REPORTS, ReportView
+
+# Numeric keys (website ids) go to runs of 2**PART_BITS consecutive ids, so
+# iteration keeps id order and new websites only touch the newest part.
+# Other keys (addresses, free-form tick ids) are hashed onto HASH_PARTS.
+PART_BITS = 8
+HASH_PARTS = 256
+
+def _part(key: str) -> int:
+    if key.isdecimal() and key.isascii() and len(key) <= 18:
+        return int(key) >> PART_BITS
+    return -1 - zlib.crc32(key.encode("utf-8", "surrogatepass")) % HASH_PARTS
+
+class PartitionedMap(Mapping):
+    # Read-only mapping split into small dicts. updated() copies only the
+    # parts holding changed keys and shares the rest, so publishing a
+    # snapshot costs O(parts + changed parts) instead of O(keys).
+    __slots__ = ("parts", "_len")
+
+    def __init__(self, parts: Optional[Dict[int, dict]] = None, size: int = 0):
+        self.parts = parts or {}
+        self._len = size
+
+    def __getitem__(self, key):
+        part = self.parts.get(_part(key))
+        if part is None:
+            raise KeyError(key)
+        return part[key]
+
+    def get(self, key, default=None):
+        part = self.parts.get(_part(key))
+        return default if part is None else part.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        part = self.parts.get(_part(key))
+        return part is not None and key in part
+
+    def __iter__(self) -> Iterator:
+        for i in sorted(self.parts):
+            yield from self.parts[i]
+
+    def __len__(self) -> int:
+        return self._len
+
+    def updated(self, changes: Dict, removed: Iterable = ()) -> "PartitionedMap":
+        if not changes and not removed:
+            return self
+        parts = dict(self.parts)
+        size = self._len
+        copied = set()
+
+        def writable(i: int) -> dict:
+            if i not in copied:
+                parts[i] = dict(parts.get(i, ()))
+                copied.add(i)
+            return parts[i]
+
+        for key, value in changes.items():
+            part = writable(_part(key))
+            size += key not in part
+            part[key] = value
+        for key in removed:
+            i = _part(key)
+            if i in parts and key in parts[i]:
+                part = writable(i)
+                del part[key]
+                size -= 1
+                if not part:
+                    del parts[i]
+        return PartitionedMap(parts, size)
+
+@dataclass(frozen=True)
+class Snapshot:
+    # Immutable read view published by Node after every block (and after
+    # each direct state change between blocks). Unchanged entries, and the
+    # map parts holding them, are shared with the previous snapshot. Readers
+    # take Node.snapshot once per request, without locking, and must treat
+    # everything in it as read-only.
+    version: int = 0
+    height: int = -1
+    websites: PartitionedMap = field(default_factory=PartitionedMap)  # id -> Website
+    validators: PartitionedMap = field(default_factory=PartitionedMap)  # address -> Validator
+    ticks: PartitionedMap = field(default_factory=PartitionedMap)  # website id -> ReportView
+    rollups: PartitionedMap = field(default_factory=PartitionedMap)  # website id -> RollupView
+    verdicts: PartitionedMap = field(default_factory=PartitionedMap)  # website id -> VerdictView
+    reports: ReportView = EMPTY_REPORTS  # global report log, for block report ranges
+    chain: ChainView = field(default_factory=lambda: ChainView([], [], 0, 0))
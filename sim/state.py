@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
 
 @dataclass
 class Validator:
@@ -19,9 +19,124 @@ class Website:
     active: bool = True
     balance_wei: int = 0
 
+class ReportView:
+    # Read-only window [lo, hi) over a report list. Lists are only appended
+    # past hi or replaced wholesale, so a view never changes under a reader.
+    __slots__ = ("items", "lo", "hi", "base")
+
+    def __init__(self, items: List[dict], lo: int, hi: int, base: int):
+        self.items = items
+        self.lo = lo
+        self.hi = hi
+        self.base = base
+
+    def last(self, n: int) -> List[dict]:
+        return self.items[max(self.hi - n, self.lo):self.hi] if n > 0 else []
+
+    def slice(self, start_seq: int, end_seq: int) -> List[dict]:
+        lo = max(start_seq - self.base, self.lo)
+        hi = min(max(end_seq - self.base, lo), self.hi)
+        return self.items[lo:hi]
+
+    def __len__(self) -> int:
+        return self.hi - self.lo
+
+    def __iter__(self) -> Iterator[dict]:
+        for i in range(self.lo, self.hi):
+            yield self.items[i]
+
+EMPTY_REPORTS = ReportView([], 0, 0, 0)
+
+class ReportLog:
+    # Append-only report list whose oldest entries can be dropped cheaply.
+    # Every report keeps a stable sequence number (base + position).
+    def __init__(self):
+        self.items: List[dict] = []
+        self.start = 0
+        self.base = 0
+
+    def append(self, report: dict):
+        self.items.append(report)
+
+    def oldest(self):
+        return self.items[self.start] if self.start < len(self.items) else None
+
+    def drop_oldest(self, k: int = 1):
+        self.start = min(self.start + k, len(self.items))
+        # Reclaim the dropped prefix once it dominates the list. This builds a
+        # new list, leaving published views of the old one intact.
+        if self.start >= 64 and self.start * 2 >= len(self.items):
+            self.items = self.items[self.start:]
+            self.base += self.start
+            self.start = 0
+
+    @property
+    def first_seq(self) -> int:
+        return self.base + self.start
+
+    @property
+    def next_seq(self) -> int:
+        return self.base + len(self.items)
+
+    def view(self) -> ReportView:
+        return ReportView(self.items, self.start, len(self.items), self.base)
+
+    def slice(self, start_seq: int, end_seq: int) -> List[dict]:
+        # Reports with start_seq <= seq < end_seq that are still retained
+        return self.view().slice(start_seq, end_seq)
+
+    def __len__(self) -> int:
+        return len(self.items) - self.start
+
+    def __iter__(self) -> Iterator[dict]:
+        for i in range(self.start, len(self.items)):
+            yield self.items[i]
+
+    def __reversed__(self) -> Iterator[dict]:
+        for i in range(len(self.items) - 1, self.start - 1, -1):
+            yield self.items[i]
+
+@dataclass
+class Rollup:
+    website_id: str
+    validator: str
+    start: int
+    resolution: int
+    count: int = 0
+    up: int = 0
+    latency_sum: int = 0
+    latency_min: int = 0
+    latency_max: int = 0
+    weight_sum: float = 0.0
+
+class RollupView:
+    # A website's rollups as published in a snapshot: (start, rollups) groups
+    # per resolution, hour groups first, in time order, with a group's
+    # rollups in validator order. Groups are shared between snapshots until
+    # one of their buckets changes.
+    __slots__ = ("hours", "minutes")
+
+    def __init__(self, hours: Tuple[tuple, ...] = (), minutes: Tuple[tuple, ...] = ()):
+        self.hours = hours
+        self.minutes = minutes
+
+    def __iter__(self) -> Iterator[Rollup]:
+        for groups in (self.hours, self.minutes):
+            for _, group in groups:
+                yield from group
+
+    def __reversed__(self) -> Iterator[Rollup]:
+        for groups in (self.minutes, self.hours):
+            for _, group in reversed(groups):
+                yield from reversed(group)
+
+EMPTY_ROLLUPS = RollupView()
+
 @dataclass
 class ChainState:
     validators: Dict[str, Validator] = field(default_factory=dict)
     websites: Dict[str, Website] = field(default_factory=dict)
-    reports: List[dict] = field(default_factory=list)
-    payouts: Dict[str, List[dict]] = field(default_factory=dict)
\ No newline at end of file
+    reports: ReportLog = field(default_factory=ReportLog)
+    payouts: Dict[str, List[dict]] = field(default_factory=dict)
+    # resolution (s) -> website id -> (bucket start, validator) -> Rollup
+    rollups: Dict[int, Dict[str, Dict[tuple, Rollup]]] = field(default_factory=dict)
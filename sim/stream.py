@@ -0,0 +1,144 @@
+# sim/stream.py
+import asyncio
+import json
+import time
+from typing import List, Optional
+from fastapi import WebSocket
+from .node import Node
+from .models import MAX_LATENCY_MS
+from .replay import Recorder
+
+# Upper bound on frames coalesced into one admission batch (and one ack)
+MAX_BATCH = 1024
+# Frames read ahead of admission; past this the reader stops reading and
+# TCP backpressure slows the sender
+MAX_QUEUED = 2 * MAX_BATCH
+# Reader end marker for a binary frame, which this text protocol rejects
+BINARY_FRAME = object()
+
+def _as_int(v) -> int:
+    # Like TickIn's int fields: a float only passes with no fractional part
+    if isinstance(v, float) and not v.is_integer():
+        raise ValueError(f"not an integer: {v!r}")
+    return int(v)
+
+def parse_frame(text: str, validator: str, now: int) -> Optional[List[dict]]:
+    # A frame is one tick object or a list of them, same fields and latency
+    # range as TickIn
+    try:
+        raw = json.loads(text)
+        items = raw if isinstance(raw, list) else [raw]
+        ticks = [
+            {
+                "website_id": str(t["websiteId"]),
+                "validator": validator,
+                "status": _as_int(t["status"]),
+                "latency": _as_int(t["latency"]),
+                "timestamp": now,
+            }
+            for t in items
+        ]
+    except (ValueError, TypeError, KeyError, OverflowError):
+        return None
+    if any(not 0 <= t["latency"] <= MAX_LATENCY_MS for t in ticks):
+        return None
+    return ticks
+
+async def authenticate(ws: WebSocket, node: Node) -> Optional[str]:
+    # First frame: {"address": ..., "token": ...}, with the stream token
+    # /validator/register returned for that address
+    try:
+        hello = json.loads(await ws.receive_text())
+        address, token = hello["address"], hello["token"]
+        if not isinstance(address, str) or not isinstance(token, str):
+            return None
+    except (ValueError, TypeError, KeyError):
+        return None
+    v = node.snapshot.validators.get(address)
+    if not v or not v.authenticated or not node.check_stream_token(address, token):
+        return None
+    return address
+
+async def stream_ticks(
+    ws: WebSocket, node: Node, recorder: Optional[Recorder] = None
+):
+    await ws.accept()
+    validator = await authenticate(ws, node)
+    if validator is None:
+        await ws.send_json({"status": "Error", "error": "Unauthorized"})
+        await ws.close(code=1008)
+        return
+    await ws.send_json({"status": "Success", "validator": validator})
+
+    frames: asyncio.Queue = asyncio.Queue(maxsize=MAX_QUEUED)
+
+    async def reader():
+        end = None
+        cancelled = False
+        try:
+            while True:
+                msg = await ws.receive()
+                if msg["type"] == "websocket.disconnect":
+                    break
+                if msg.get("text") is None:
+                    end = BINARY_FRAME
+                    break
+                await frames.put(msg["text"])
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            try:
+                frames.put_nowait(end)
+            except asyncio.QueueFull:
+                # The handler drains the queue unless it cancelled us on its
+                # way out, in which case waiting would hang forever
+                if not cancelled:
+                    await frames.put(end)
+
+    reader_task = asyncio.create_task(reader())
+    received = 0
+    try:
+        closed = False
+        while not closed:
+            # Block for one frame, then coalesce whatever else arrived while
+            # the previous batch was being admitted.
+            pending = [await frames.get()]
+            while len(pending) < MAX_BATCH and not frames.empty():
+                pending.append(frames.get_nowait())
+            end = pending[-1]
+            if end is None or end is BINARY_FRAME:
+                pending.pop()
+                closed = True
+
+            now = int(time.time())
+            ticks, invalid = [], 0
+            for text in pending:
+                parsed = parse_frame(text, validator, now)
+                if parsed is None:
+                    invalid += 1
+                else:
+                    ticks.extend(parsed)
+            if end is BINARY_FRAME:
+                await ws.close(code=1003, reason="binary frames are not supported")
+            if not ticks and not invalid:
+                continue
+
+            if recorder and ticks:
+                rows = [[t["website_id"], t["status"], t["latency"]] for t in ticks]
+                recorder.record("ticks", validator, now, rows)
+
+            accepted = sum(await node.submit_ticks_async(ticks))
+            received += len(ticks)
+            if not closed:
+                await ws.send_json(
+                    {
+                        "status": "Success",
+                        "acked": received,
+                        "accepted": accepted,
+                        "total": len(ticks),
+                        "invalid": invalid,
+                    }
+                )
+    finally:
+        reader_task.cancel()
@@ -0,0 +1,109 @@
+# sim/verdicts.py
+from typing import List, Sequence, Tuple
+import numpy as np
+from .retention import DOWN_STATUS, UP_STATUS
+
+# One consensus verdict per website per block: 45 bytes instead of a report
+# dict per tick. Dissenting validators live in a flat list; a record points
+# at its run with (dissent, dissents).
+VERDICT_DTYPE = np.dtype(
+    [
+        ("height", "<u8"),
+        ("time", "<i8"),
+        ("status", "u1"),
+        ("latency", "<i8"),  # ML-weighted median
+        ("ticks", "<u4"),
+        ("weight", "<f4"),  # total ML weight behind the block's ticks
+        ("agreement", "<f4"),  # share of that weight backing `status`
+        ("dissent", "<u4"),
+        ("dissents", "<u4"),
+    ]
+)
+
+def weighted_median(values: Sequence[int], weights: Sequence[float]) -> int:
+    pairs = sorted(zip(values, weights))
+    half = sum(weights) / 2
+    acc = 0.0
+    for v, w in pairs:
+        acc += w
+        if acc >= half:
+            return v
+    return pairs[-1][0]
+
+def verdict(reports: List[dict]) -> Tuple[int, int, float, float, List[str]]:
+    # (status, latency, weight, agreement, dissenters) for one website's
+    # reports in a block. Each tick counts with its ML weight; ties, and
+    # blocks where every weight is zero, resolve to down.
+    weights = [r.get("ml_weight", 1.0) for r in reports]
+    total = sum(weights)
+    if total <= 0:
+        weights = [1.0] * len(reports)
+        total = float(len(reports))
+    up = sum(w for r, w in zip(reports, weights) if r["status"] == UP_STATUS)
+    status = UP_STATUS if up > total - up else DOWN_STATUS
+    latency = weighted_median([r["latency"] for r in reports], weights)
+    dissenters = sorted({r["validator"] for r in reports if r["status"] != status})
+    backing = up if status == UP_STATUS else total - up
+    return status, latency, total, backing / total, dissenters
+
+class VerdictView:
+    # Read-only window [lo, hi) over a timeline's arrays, like ReportView
+    __slots__ = ("records", "dissenters", "lo", "hi")
+
+    def __init__(self, records: np.ndarray, dissenters: List[str], lo: int, hi: int):
+        self.records = records
+        self.dissenters = dissenters
+        self.lo = lo
+        self.hi = hi
+
+    def last(self, n: int) -> np.ndarray:
+        return self.records[max(self.hi - n, self.lo):self.hi] if n > 0 else self.records[:0]
+
+    def __len__(self) -> int:
+        return self.hi - self.lo
+
+EMPTY_VERDICTS = VerdictView(np.zeros(0, dtype=VERDICT_DTYPE), [], 0, 0)
+
+class VerdictTimeline:
+    # Per-website verdicts, oldest first, in a growable structured array.
+    # Writes only go past the published end; growing and reclaiming pruned
+    # records build new arrays, so views stay valid without locking.
+    def __init__(self, capacity: int = 16):
+        self.records = np.zeros(capacity, dtype=VERDICT_DTYPE)
+        self.dissenters: List[str] = []
+        self.start = 0
+        self.end = 0
+
+    def append(self, height: int, time: int, reports: List[dict]):
+        status, latency, weight, agreement, dissenters = verdict(reports)
+        if self.end == len(self.records):
+            self._rebuild(max(2 * (self.end - self.start), 16))
+        self.records[self.end] = (
+            height, time, status, latency, len(reports), weight, agreement,
+            len(self.dissenters), len(dissenters),
+        )
+        self.dissenters.extend(dissenters)
+        self.end += 1
+
+    def prune_before(self, cutoff: int):
+        times = self.records["time"][self.start:self.end]
+        self.start += int(np.searchsorted(times, cutoff))
+        if self.start >= 64 and self.start * 2 >= self.end:
+            self._rebuild(max(2 * (self.end - self.start), 16))
+
+    def _rebuild(self, capacity: int):
+        live = self.records[self.start:self.end]
+        records = np.zeros(capacity, dtype=VERDICT_DTYPE)
+        records[:len(live)] = live
+        offset = int(live["dissent"][0]) if len(live) else len(self.dissenters)
+        records["dissent"][:len(live)] -= offset
+        self.dissenters = self.dissenters[offset:]
+        self.records = records
+        self.end -= self.start
+        self.start = 0
+
+    def view(self) -> VerdictView:
+        return VerdictView(self.records, self.dissenters, self.start, self.end)
+
+    def __len__(self) -> int:
+        return self.end - self.start